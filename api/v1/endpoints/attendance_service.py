@@ -0,0 +1,199 @@
+"""
+Jalur baca kehadiran dan cache PDF daftar hadir.
+
+PDF disimpan di disk dengan kunci (event_id, max(attendance.updated_at,
+member.updated_at, event.updated_at), jumlah baris), dibangun sekali di
+worker thread walaupun banyak member mengunduh bersamaan, lalu dikirim
+langsung dari file. PDF dengan stamp lebih lama dihapus setelah PDF baru
+terpasang; pembaca yang kehilangan file-nya (dihapus build lain atau
+invalidate) membangun ulang lewat open_attendance_pdf.
+"""
+import asyncio
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from ..models.events import Event, Attendance
+from ..models.user import Member
+
+# Di luar folder uploads agar tidak ikut tersaji lewat route file
+ATTENDANCE_PDF_CACHE_DIR = Path(os.getenv("ATTENDANCE_PDF_CACHE_DIR", "cache/attendance_pdf"))
+
+ATTENDANCE_PDF_OPEN_ATTEMPTS = 3
+ATTENDANCE_PDF_CHUNK_SIZE = 64 * 1024
+
+_build_locks: Dict[str, asyncio.Lock] = {}
+
+# 🔹 Kolom projection kehadiran: nama & status dalam satu SELECT ... JOIN members,
+# tanpa membangun objek ORM Attendance/Member
+ATTENDANCE_COLUMNS = (
+    Attendance.id,
+    Attendance.member_id,
+    Attendance.event_id,
+    Member.full_name,
+    Attendance.status,
+    Attendance.notes,
+    Attendance.created_at,
+    Attendance.updated_at,
+)
+
+
+def fetch_attendance_rows(db: Session, event_id: int, member_ids: Optional[List[int]] = None, order_by_name: bool = False) -> List[dict]:
+    query = (select(*ATTENDANCE_COLUMNS)
+             .join(Member, Member.id == Attendance.member_id)
+             .where(Attendance.event_id == event_id))
+    if member_ids is not None:
+        query = query.where(Attendance.member_id.in_(member_ids))
+    if order_by_name:
+        query = query.order_by(Member.full_name.asc())
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
+def invalidate_attendance_pdf(event_id: int) -> None:
+    """Hapus semua PDF cache milik event (dipanggil setelah kehadiran/event berubah)."""
+    for path in ATTENDANCE_PDF_CACHE_DIR.glob(f"{event_id}_*.pdf"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _pdf_stamp(path: Path) -> int:
+    # Nama file: {event_id}_{stamp}_{total}.pdf
+    try:
+        return int(path.stem.split("_")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def remove_older_attendance_pdfs(event_id: int, current: Path) -> None:
+    """
+    Hapus PDF event dengan stamp lebih lama dari `current`, setelah `current`
+    terpasang. Build dari snapshot lama yang selesai belakangan tidak
+    menghapus PDF yang lebih baru.
+    """
+    stamp = _pdf_stamp(current)
+    for path in ATTENDANCE_PDF_CACHE_DIR.glob(f"{event_id}_*.pdf"):
+        if path != current and _pdf_stamp(path) < stamp:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def build_attendance_pdf(path: Path, event_title: str, event_date: datetime, attendances: List[dict]) -> None:
+    """Bangun PDF daftar hadir ke `path` (blocking, jalankan di worker thread)."""
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    doc = SimpleDocTemplate(str(tmp_path), pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
+
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Tambahkan Judul Event dan Tanggal
+    elements.append(Paragraph(f"Daftar Hadir Peserta", styles['Title']))
+    elements.append(Spacer(1, 0.2*inch))
+    elements.append(Paragraph(f"<b>Acara:</b> {event_title}", styles['Normal']))
+    elements.append(Paragraph(f"<b>Tanggal:</b> {event_date.strftime('%d %B %Y')}", styles['Normal']))
+    elements.append(Spacer(1, 0.4*inch))
+
+    # Siapkan data untuk tabel
+    table_data = [['No.', 'Nama Peserta', 'Status', 'Keterangan']]
+    table_data.extend([
+        [
+            str(i + 1),
+            att["full_name"],
+            str(att["status"] or "N/A"),
+            str(att["notes"] or "")
+        ]
+        for i, att in enumerate(attendances)
+    ])
+    # Buat dan styling tabel
+    table = Table(table_data, colWidths=[0.5*inch, 3*inch, 1.5*inch, 2*inch])
+
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a4a4a')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f0f0f0')),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    table.setStyle(style)
+
+    elements.append(table)
+
+    # Build PDF lalu pindahkan secara atomik agar pembaca tidak melihat file setengah jadi
+    try:
+        doc.build(elements)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            os.remove(tmp_path)
+
+
+async def get_attendance_pdf(db: Session, event: Event) -> Optional[Path]:
+    """
+    Path PDF daftar hadir event dari cache, dibangun jika belum ada.
+    Mengembalikan None jika event belum punya data kehadiran.
+    """
+    # Join members sama dengan fetch_attendance_rows: ganti nama member ikut mengubah kunci
+    attendance_update, member_update, total = db.execute(
+        select(func.max(Attendance.updated_at), func.max(Member.updated_at), func.count(Attendance.id))
+        .join(Member, Member.id == Attendance.member_id)
+        .where(Attendance.event_id == event.id)
+    ).one()
+    if not total:
+        return None
+
+    stamp = max(value for value in (attendance_update, member_update, event.updated_at) if value)
+    path = ATTENDANCE_PDF_CACHE_DIR / f"{event.id}_{int(stamp.timestamp())}_{total}.pdf"
+    if path.exists():
+        return path
+
+    # Satu build per kunci; request lain menunggu hasil yang sama
+    lock = _build_locks.setdefault(path.name, asyncio.Lock())
+    async with lock:
+        if not path.exists():
+            attendances = fetch_attendance_rows(db, event.id, order_by_name=True)
+            ATTENDANCE_PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            await run_in_threadpool(build_attendance_pdf, path, event.title, event.date, attendances)
+            remove_older_attendance_pdfs(event.id, path)
+    _build_locks.pop(path.name, None)
+    return path
+
+
+async def open_attendance_pdf(db: Session, event: Event) -> Optional[BinaryIO]:
+    """
+    File PDF daftar hadir yang sudah terbuka, atau None jika belum ada kehadiran.
+
+    File bisa terhapus (invalidate atau build yang lebih baru) antara dicek dan
+    dibuka; dalam hal itu kunci dihitung ulang dan PDF dibangun lagi. File yang
+    sudah terbuka tetap terbaca sampai selesai walaupun kemudian dihapus.
+    """
+    for _ in range(ATTENDANCE_PDF_OPEN_ATTEMPTS):
+        path = await get_attendance_pdf(db, event)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            db.rollback()   # akhiri snapshot baca agar kunci berikutnya melihat perubahan terbaru
+    raise RuntimeError(f"PDF daftar hadir event {event.id} terus terhapus saat akan dikirim")
+
+
+def iter_file(file: BinaryIO):
+    """Isi file per chunk untuk StreamingResponse; file ditutup setelah selesai."""
+    with file:
+        while chunk := file.read(ATTENDANCE_PDF_CHUNK_SIZE):
+            yield chunk
@@ -1,24 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from core.security import create_access_token, verify_token
-from core.database import SessionLocal, admin_required, get_db
-from ..schemas.user import UserCreate, UserCreateWithRole, UserOut
+from core.security import verify_token, invalidate_principal
+from core.database import admin_required, get_db
+from core.passwords import hash_password, verify_password
+from core.rate_limit import login_guard
+from ..schemas.user import TokenRefreshRequest, UserCreate, UserCreateWithRole, UserOut
 from ..models.user import User
-from passlib.context import CryptContext
+from .auth_service import issue_tokens, logout_refresh_token, revoke_user_tokens, rotate_refresh_token
 import re
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# ======================
-# 🔐 Password Utilities
-# ======================
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
 
 
 # ======================
@@ -33,7 +25,7 @@ async def admin_register(user: UserCreateWithRole, db: Session = Depends(get_db)
             detail="Username already registered"
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
 
     new_user = User(
         username=user.username,
@@ -43,6 +35,8 @@ async def admin_register(user: UserCreateWithRole, db: Session = Depends(get_db)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_principal(new_user.username)
+    await login_guard.forget_credentials(user.username, user.password)
     return {"message": f"User with role '{user.role}' registered successfully"}
 
 
@@ -91,7 +85,7 @@ async def public_register(user: UserCreate, db: Session = Depends(get_db)):
         )
 
     # ✅ Create user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
 
     new_user = User(
         username=user.username,
@@ -101,6 +95,8 @@ async def public_register(user: UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_principal(new_user.username)
+    await login_guard.forget_credentials(user.username, user.password)
     return {"message": "User registered successfully."}
 
 
@@ -108,38 +104,81 @@ async def public_register(user: UserCreate, db: Session = Depends(get_db)):
 # 🔑 Login
 # ======================
 @router.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    db = SessionLocal()
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
+    invalid_credentials = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid username or password."
+    )
+
+    # 🚦 Rate limit per IP & lockout per username, sebelum query DB maupun bcrypt
+    # (request.client sudah IP asli jika uvicorn menerima X-Forwarded-For dari proxy)
+    client_ip = request.client.host if request.client else "unknown"
+    await login_guard.check(form_data.username, client_ip)
+
+    # ❌ Kombinasi yang baru saja gagal: tolak tanpa DB/bcrypt
+    if await login_guard.is_known_bad(form_data.username, form_data.password):
+        await login_guard.record_failure(form_data.username, form_data.password)
+        raise invalid_credentials
+
     user = db.query(User).filter(User.username == form_data.username).first()
 
     # ❌ Username not found
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid username or password."
-        )
+        await login_guard.record_failure(form_data.username, form_data.password)
+        raise invalid_credentials
 
-    # ❌ Incorrect password
-    if not verify_password(form_data.password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid username or password."
-        )
+    # ❌ Incorrect password (bcrypt di thread pool, bukan di event loop)
+    valid, new_hash = await verify_password(form_data.password, user.password)
+    if not valid:
+        await login_guard.record_failure(form_data.username, form_data.password)
+        raise invalid_credentials
+
+    await login_guard.record_success(user.username)
+
+    # 🔁 Hash ulang jika BCRYPT_ROUNDS berubah atau skema hash usang
+    if new_hash:
+        user.password = new_hash
 
-    # ✅ Create access token
+    # ✅ Access token pendek + refresh token (di-commit bersama hash baru)
     try:
-        access_token = create_access_token(data={"sub": user.username})
+        tokens, _ = issue_tokens(db, user)
+        db.commit()
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Token generation failed: {str(e)}"
         )
 
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "message": "Login successful."
-    }
+    if new_hash:
+        invalidate_principal(user.username)
+    return {**tokens, "message": "Login successful."}
+
+
+# ======================
+# 🔄 Refresh & Logout
+# ======================
+@router.post("/refresh")
+async def refresh_token(payload: TokenRefreshRequest, db: Session = Depends(get_db)):
+    tokens = rotate_refresh_token(db, payload.refresh_token)
+    return {**tokens, "message": "Token refreshed."}
+
+
+@router.post("/logout")
+async def logout(payload: TokenRefreshRequest, db: Session = Depends(get_db)):
+    logout_refresh_token(db, payload.refresh_token)
+    return {"message": "Logged out."}
+
+
+@router.post("/logout-all")
+async def logout_all(current_user: User = Depends(verify_token), db: Session = Depends(get_db)):
+    revoke_user_tokens(db, current_user.id)
+    db.commit()
+    return {"message": "Logged out from all devices."}
 
 
 # ======================
@@ -0,0 +1,141 @@
+"""
+Access token pendek + refresh token panjang dengan rotasi.
+
+- Access token (JWT, ACCESS_TOKEN_EXPIRE_MINUTES) membawa uid/role/ver dan
+  diverifikasi tanpa query user (lihat core/security.py).
+- Refresh token berupa string acak; di DB hanya tersimpan hash-nya. Setiap
+  /auth/refresh mencabut token lama dan menerbitkan token baru di family
+  yang sama. Token yang sudah dicabut lalu dipakai lagi dianggap bocor:
+  seluruh family dicabut dan versi token user dinaikkan sehingga access
+  token yang masih berlaku ikut batal.
+"""
+import hashlib
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from core.security import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    access_token_claims,
+    create_access_token,
+    invalidate_token_version,
+)
+from ..models.auth import RefreshToken, TokenVersion
+from ..models.user import User
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+
+def _invalid_refresh_token(detail: str = "Invalid or expired refresh token.") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_token_version(db: Session, user_id: int) -> int:
+    version = db.scalar(select(TokenVersion.version).where(TokenVersion.user_id == user_id))
+    return version or 0
+
+
+def bump_token_version(db: Session, user_id: int) -> None:
+    """
+    Naikkan versi token user (belum di-commit). Cache versi di proses ini
+    dibersihkan setelah commit; worker lain menyusul setelah TTL cache.
+    """
+    stmt = mysql_insert(TokenVersion).values(user_id=user_id, version=1)
+    db.execute(stmt.on_duplicate_key_update(version=TokenVersion.version + 1))
+    event.listen(db, "after_commit", lambda session: invalidate_token_version(user_id), once=True)
+
+
+def issue_tokens(db: Session, user: User, family_id: Optional[str] = None) -> Tuple[Dict, RefreshToken]:
+    """Terbitkan pasangan access + refresh token (baris refresh di-flush, belum di-commit)."""
+    refresh_token = secrets.token_urlsafe(48)
+    row = RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(refresh_token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.now() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(row)
+    db.flush()
+
+    access_token = create_access_token(access_token_claims(user, get_token_version(db, user.id)))
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }, row
+
+
+def revoke_family(db: Session, family_id: str) -> None:
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now())
+    )
+
+
+def revoke_user_tokens(db: Session, user_id: int) -> None:
+    """Cabut semua refresh token user dan batalkan access token-nya."""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now())
+    )
+    bump_token_version(db, user_id)
+
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> Dict:
+    """Tukar refresh token dengan pasangan token baru; token lama langsung dicabut."""
+    row = db.execute(
+        select(RefreshToken)
+        .where(RefreshToken.token_hash == hash_refresh_token(refresh_token))
+        .with_for_update()
+    ).scalar_one_or_none()
+    if row is None:
+        raise _invalid_refresh_token()
+
+    now = datetime.now()
+    if row.revoked_at is not None:
+        # 🚨 Token lama dipakai ulang: cabut seluruh family + access token user
+        revoke_family(db, row.family_id)
+        bump_token_version(db, row.user_id)
+        db.commit()
+        raise _invalid_refresh_token("Refresh token reuse detected. Please log in again.")
+    if row.expires_at <= now:
+        db.rollback()
+        raise _invalid_refresh_token()
+
+    user = db.get(User, row.user_id)
+    if user is None:
+        db.rollback()
+        raise _invalid_refresh_token()
+
+    tokens, new_row = issue_tokens(db, user, row.family_id)
+    row.revoked_at = now
+    row.replaced_by_id = new_row.id
+    db.commit()
+    return tokens
+
+
+def logout_refresh_token(db: Session, refresh_token: str) -> None:
+    """Cabut family dari refresh token ini (logout satu perangkat)."""
+    family_id = db.scalar(
+        select(RefreshToken.family_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(refresh_token))
+    )
+    if family_id is not None:
+        revoke_family(db, family_id)
+        db.commit()
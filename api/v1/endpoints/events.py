@@ -1,10 +1,13 @@
 from datetime import timezone
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, select, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from typing import List, Optional
 from datetime import datetime, timedelta
-from core.database import get_db, admin_required
+from core.cache import response_cache
+from core.database import get_db, get_async_db, admin_required
 from core.security import verify_token
 from ..models.events import Event, Attendance
 from ..models.user import Member, User
@@ -15,17 +18,15 @@ from ..schemas.events import (
 from ..models.notification import Notification
 from ..models.events import EventPhoto  # Model yang menyimpan foto event
 from core.utils.file_handler import FileHandler  # Fungsi untuk menghapus file
-from .notification_service import send_notification
+from core.utils.pagination import decode_cursor, keyset_before, split_page
+from core.utils.search import fulltext_match
+from .notification_service import enqueue_broadcast
+from .attendance_service import fetch_attendance_rows, invalidate_attendance_pdf, iter_file, open_attendance_pdf
 
-import io
 from fastapi.responses import StreamingResponse
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 from datetime import datetime, timezone
 import locale
+import os
 
 router = APIRouter()
 
@@ -46,29 +47,27 @@ def format_event_datetime(dt: datetime) -> str:
 @admin_required()
 async def create_event(
     event: EventCreate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
     db_event = Event(**event.dict(), created_by=current_user.id)
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    db.flush()  # butuh id untuk data notifikasi
 
     # Format tanggal event dengan format Indonesia
     formatted_date = format_event_datetime(db_event.date)
 
-    # Notifikasi ke semua member
-    members = db.query(User).filter(User.role == "Member").all()
-    for member in members:
-        background_tasks.add_task(
-            send_notification,
-            db=db,
-            user_id=member.id,
-            title=f"Acara Baru: {event.title}",
-            content=f"📅 Jadwal: {formatted_date}",
-            data={"type": "event", "id": str(db_event.id)}
-        )
+    # Notifikasi ke semua member, tersimpan dalam transaksi yang sama
+    enqueue_broadcast(
+        db,
+        title=f"Acara Baru: {event.title}",
+        content=f"📅 Jadwal: {formatted_date}",
+        data={"type": "event", "id": str(db_event.id)}
+    )
+
+    db.commit()
+    db.refresh(db_event)
+    await response_cache.evict("events")
 
     return db_event
 
@@ -88,28 +87,42 @@ async def create_event(
 #     return events
 @router.get("/", response_model=PaginatedEventResponse)
 async def get_events(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor dari meta.next_cursor; jika diisi, page diabaikan"),
+    include_total: bool = Query(True, description="Hitung total (COUNT) seluruh event"),
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    total = db.query(Event).count()
-    offset = (page - 1) * limit
-    events = (db.query(Event)
-              .order_by(Event.date.desc())
-              .offset(offset)
-              .limit(limit)
-              .all())
-
-    return {
+    if cached := await response_cache.get(request):
+        return cached
+
+    query = (select(Event)
+             .options(selectinload(Event.photos))
+             .order_by(Event.date.desc(), Event.id.desc()))
+
+    if cursor:
+        # Keyset pagination: lanjut dari posisi (date, id) terakhir tanpa OFFSET
+        query = query.where(keyset_before(Event.date, Event.id, decode_cursor(cursor)))
+    else:
+        query = query.offset((page - 1) * limit)
+
+    result = await db.execute(query.limit(limit + 1))
+    events, next_cursor = split_page(result.scalars().all(), limit, lambda e: (e.date, e.id))
+
+    total = await db.scalar(select(func.count()).select_from(Event)) if include_total else None
+
+    return await response_cache.store(request, PaginatedEventResponse, {
         "data": events,
         "meta": {
             "page": page,
             "limit": limit,
             "total": total,
-            "total_pages": (total + limit - 1) // limit  # pembulatan ke atas
+            "total_pages": (total + limit - 1) // limit if total is not None else None,  # pembulatan ke atas
+            "next_cursor": next_cursor
         }
-    }
+    }, tags=("events",))
 
 
 
@@ -119,48 +132,59 @@ async def search_events(
     date: Optional[datetime] = None,
     time: Optional[timedelta] = None,
     status: Optional[EventStatus] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Event)
+    query = select(Event)
+    relevance = None
 
-    # 🔍 Keyword search
+    # 🔍 Keyword search (indeks FULLTEXT, prefix match, urut relevansi)
     if keyword:
-        search_pattern = f"%{keyword}%"
-        query = query.filter(
-            or_(
-                Event.title.ilike(search_pattern),
-                Event.description.ilike(search_pattern),
-                Event.location.ilike(search_pattern)
+        relevance = fulltext_match((Event.title, Event.description, Event.location), keyword)
+        if relevance is not None:
+            query = query.where(relevance)
+        else:
+            # Kata kunci terlalu pendek untuk indeks FULLTEXT: prefix LIKE
+            search_pattern = f"{keyword}%"
+            query = query.where(
+                or_(
+                    Event.title.ilike(search_pattern),
+                    Event.location.ilike(search_pattern)
+                )
             )
-        )
 
     # 📅 Filter berdasarkan tanggal tertentu
     if date:
-        query = query.filter(Event.date == date)
+        query = query.where(Event.date == date)
     else:
         # ✅ Default: satu bulan terakhir
         one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
-        query = query.filter(Event.date >= one_month_ago)
+        query = query.where(Event.date >= one_month_ago)
 
     # ⏰ Filter waktu (optional)
     if time:
-        query = query.filter(Event.time == time)
+        query = query.where(Event.time == time)
 
     # 📌 Filter berdasarkan status
     if status:
-        query = query.filter(Event.status == status.value)
+        query = query.where(Event.status == status.value)
 
-    query = query.order_by(Event.date.asc())
+    if relevance is not None:
+        query = query.order_by(relevance.desc(), Event.date.asc())
+    else:
+        query = query.order_by(Event.date.asc())
 
-    return query.all()
+    result = await db.execute(query)
+    return result.scalars().all()
 
 @router.get("/{event_id}", response_model=EventResponse)
 async def get_event(
     event_id: int,
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if event := db.query(Event).filter(Event.id == event_id).first():
+    if event := await db.scalar(
+        select(Event).options(selectinload(Event.photos)).where(Event.id == event_id)
+    ):
         return event
     else:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -204,7 +228,6 @@ async def get_event(
 async def update_event(
     event_id: int,
     event_update: EventUpdate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -219,23 +242,19 @@ async def update_event(
     for field, value in event_update.dict(exclude_unset=True).items():
         setattr(db_event, field, value)
 
-    db.commit()
-    db.refresh(db_event)
-
     # 🔹 Kirim notifikasi HANYA jika tanggal berubah
     if event_update.date and event_update.date != old_date:
         formatted_date = format_event_datetime(db_event.date)
-        members = db.query(User).filter(User.role == "Member").all()
-
-        for member in members:
-            background_tasks.add_task(
-                send_notification,
-                db=db,
-                user_id=member.id,
-                title=f"📅 Jadwal Diubah: {db_event.title}",
-                content=f"Acara dijadwalkan ulang ke {formatted_date}",
-                data={"type": "event", "id": str(db_event.id)}
-            )
+        enqueue_broadcast(
+            db,
+            title=f"📅 Jadwal Diubah: {db_event.title}",
+            content=f"Acara dijadwalkan ulang ke {formatted_date}",
+            data={"type": "event", "id": str(db_event.id)}
+        )
+
+    db.commit()
+    db.refresh(db_event)
+    await response_cache.evict("events")
 
     return db_event
 
@@ -265,6 +284,9 @@ async def delete_event(
     # Hapus event setelah semua foto dihapus
     db.delete(event)
     db.commit()
+    invalidate_attendance_pdf(event_id)
+    # Notulensi ikut terhapus (cascade)
+    await response_cache.evict("events", "minutes")
 
     return {"message": "Event and associated photos deleted"}
 
@@ -280,50 +302,46 @@ async def create_or_update_attendance(
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    updated_attendances = []
+    if not attendances:
+        return []
+
+    # Entri terakhir untuk member yang sama yang dipakai
+    entries = {attendance.member_id: attendance for attendance in attendances}
+    now = datetime.now()
+
+    # notes hanya ditimpa jika dikirim (sama seperti exclude_unset sebelumnya),
+    # jadi paling banyak dua statement INSERT ... ON DUPLICATE KEY UPDATE
+    with_notes = [a for a in entries.values() if "notes" in a.model_fields_set]
+    without_notes = [a for a in entries.values() if "notes" not in a.model_fields_set]
+
+    for group, update_notes in ((with_notes, True), (without_notes, False)):
+        if not group:
+            continue
+        stmt = mysql_insert(Attendance).values([
+            {
+                "event_id": event_id,
+                "member_id": attendance.member_id,
+                "status": attendance.status.value,
+                "notes": attendance.notes,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for attendance in group
+        ])
+        on_duplicate = {
+            "status": stmt.inserted.status,
+            "updated_at": stmt.inserted.updated_at,
+        }
+        if update_notes:
+            on_duplicate["notes"] = stmt.inserted.notes
+        db.execute(stmt.on_duplicate_key_update(**on_duplicate))
+
+    db.commit()
+    invalidate_attendance_pdf(event_id)
 
-    for attendance in attendances:
-        existing_attendance = (
-            db.query(Attendance)
-            .filter(
-                Attendance.event_id == event_id,
-                Attendance.member_id == attendance.member_id,
-            )
-            .first()
-        )
-        if existing_attendance:
-            # Update jika sudah ada
-            for field, value in attendance.dict(exclude_unset=True).items():
-                setattr(existing_attendance, field, value)
-            db.commit()
-            db.refresh(existing_attendance)
-            updated_attendances.append(existing_attendance)
-        else:
-            # Tambah baru jika belum ada
-            new_attendance = Attendance(
-                event_id=event_id,
-                **attendance.dict()
-            )
-            db.add(new_attendance)
-            db.commit()
-            db.refresh(new_attendance)
-            updated_attendances.append(new_attendance)
-
-    # Bentuk response manual agar ada full_name
-    response_data = []
-    for att in updated_attendances:
-        response_data.append({
-            "id": att.id,
-            "member_id": att.member_id,
-            "event_id": att.event_id,
-            "full_name": att.member.full_name if att.member else "",
-            "status": att.status,
-            "notes": att.notes,
-            "created_at": att.created_at,
-            "updated_at": att.updated_at
-        })
-
-    return response_data
+    # Response dari satu SELECT ... JOIN members, urut sesuai input
+    rows = {row["member_id"]: row for row in fetch_attendance_rows(db, event_id, member_ids=list(entries))}
+    return [rows[member_id] for member_id in entries if member_id in rows]
 
 @router.put("/{event_id}/attendance/{member_id}", response_model=AttendanceResponse)
 @admin_required()
@@ -347,8 +365,8 @@ async def update_attendance(
         setattr(db_attendance, field, value)
 
     db.commit()
-    db.refresh(db_attendance)
-    return db_attendance
+    invalidate_attendance_pdf(event_id)
+    return fetch_attendance_rows(db, event_id, member_ids=[member_id])[0]
 
 @router.get("/{event_id}/attendance", response_model=List[AttendanceResponse])
 async def get_attendance(
@@ -356,23 +374,8 @@ async def get_attendance(
     db: Session = Depends(get_db),
     current_user: User = Depends(verify_token)
 ):
-    attendances = db.query(Attendance).join(Member).filter(Attendance.event_id == event_id).all()
-
-    result = [
-        AttendanceResponse(
-            id=att.id,
-            member_id=att.member_id,
-            event_id=att.event_id,
-            full_name=att.member.full_name,  # Ambil dari relasi
-            status=att.status,
-            notes=att.notes,
-            created_at=att.created_at,
-            updated_at=att.updated_at
-        )
-        for att in attendances
-    ]
-
-    return result
+    # Satu SELECT ... JOIN members, full_name ikut dalam projection
+    return fetch_attendance_rows(db, event_id)
 
 @router.get("/{event_id}/attendance/pdf", response_class=StreamingResponse)
 async def download_attendance_pdf(
@@ -388,75 +391,25 @@ async def download_attendance_pdf(
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    # 2. Ambil data kehadiran, urutkan berdasarkan nama untuk kerapian
-    attendances = (
-        db.query(Attendance)
-        .join(Member)
-        .filter(Attendance.event_id == event_id)
-        .order_by(Member.full_name.asc())
-        .all()
-    )
+    # 2. Buka PDF dari cache (dibangun di worker thread jika kehadiran berubah)
+    pdf_file = await open_attendance_pdf(db, event)
 
-    if not attendances:
+    if pdf_file is None:
         raise HTTPException(
             status_code=404, 
             detail="Belum ada data kehadiran untuk event ini."
         )
 
-    # 3. Buat PDF di dalam memori
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
-    
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Tambahkan Judul Event dan Tanggal
-    elements.append(Paragraph(f"Daftar Hadir Peserta", styles['Title']))
-    elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph(f"<b>Acara:</b> {event.title}", styles['Normal']))
-    elements.append(Paragraph(f"<b>Tanggal:</b> {event.date.strftime('%d %B %Y')}", styles['Normal']))
-    elements.append(Spacer(1, 0.4*inch))
-
-    # 4. Siapkan data untuk tabel
-    table_data = [['No.', 'Nama Peserta', 'Status', 'Keterangan']]
-    table_data.extend([
-        [
-            str(i + 1),
-            att.member.full_name,
-            str(getattr(att, "status", None) or "N/A"),
-            str(getattr(att, "notes", "") or "")
-        ]
-        for i, att in enumerate(attendances)
-    ])
-    # 5. Buat dan styling tabel
-    table = Table(table_data, colWidths=[0.5*inch, 3*inch, 1.5*inch, 2*inch])
-    
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a4a4a')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f0f0f0')),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ])
-    table.setStyle(style)
-    
-    elements.append(table)
-
-    # Build PDF
-    doc.build(elements)
-    
-    buffer.seek(0) # Pindahkan kursor ke awal buffer
-
-    # 6. Kirim response sebagai file yang bisa diunduh
+    # 3. Kirim file sebagai unduhan, di-stream dari disk
     safe_title = "".join(str(c) for c in event.title if str(c).isalnum() or c in (' ', '_')).rstrip()
     filename = f"daftar_hadir_{safe_title.replace(' ', '_').lower()}.pdf"
 
+    # File sudah terbuka: tetap terkirim utuh walaupun cache-nya dihapus di tengah jalan
     return StreamingResponse(
-        buffer,
+        iter_file(pdf_file),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
\ No newline at end of file
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(os.fstat(pdf_file.fileno()).st_size),
+        }
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from typing import List
 from core.database import get_db, admin_required
 from core.security import verify_token
@@ -58,9 +58,9 @@ async def get_feedbacks(
 ):
     feedback = (db.query(Feedback)
                 .join(Member)
+                .options(contains_eager(Feedback.member))  # full_name penulis dari JOIN yang sama, tanpa query per feedback
                 .filter(Feedback.event_id == event_id).all()
-                
-    )       
+    )
     result = [
         FeedbackResponse(
             id=getattr(att, "id", 0),
@@ -82,6 +82,7 @@ async def get_single_feedback(
 ):
     feedback = (db.query(Feedback)
                 .join(Member)
+                .options(contains_eager(Feedback.member))
                 .filter(Feedback.id == feedback_id).first()
     )
 
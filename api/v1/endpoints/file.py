@@ -1,27 +1,57 @@
-from fastapi import Depends, HTTPException, Request
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 from fastapi.routing import APIRouter
+from starlette.concurrency import run_in_threadpool
 import os
 from api.v1.models.user import User
-from core.security import verify_token
+from core.security import authenticate_token, oauth2_scheme_optional
+from core.utils.signed_url import verify_signed_path
 from core.database import get_db
+from core.utils.file_metadata import get_cached_metadata, load_metadata, is_not_modified, last_modified
 from sqlalchemy.orm import Session
 
 router = APIRouter()
 
+CACHE_CONTROL = "private, max-age=3600"
+
+def _validator_headers(metadata: dict) -> dict:
+    return {
+        "ETag": metadata["etag"],
+        "Last-Modified": last_modified(metadata),
+        "Cache-Control": CACHE_CONTROL,
+    }
+
 @router.get("/{file_path:path}")
 async def protected_file(
     request: Request,
     file_path: str,
-    current_user: User = Depends(verify_token),
+    exp: Optional[int] = None,
+    sig: Optional[str] = None,
+    token: Optional[str] = Depends(oauth2_scheme_optional),
     db: Session = Depends(get_db)
 ):
     """
     Endpoint untuk mengakses file yang diproteksi.
     Sekarang mendukung path dari database yang dimulai dengan '/uploads/'
+
+    URL bertanda tangan (?exp=...&sig=..., dibuat oleh sign_url pada response API)
+    diverifikasi tanpa query database. Tanpa tanda tangan yang valid, request
+    wajib membawa Bearer token seperti sebelumnya. File users/ tidak pernah
+    diterima lewat tanda tangan: selalu dicek pemilik atau admin.
     """
-    if current_user is None:
-        raise HTTPException(status_code=200, detail="Unauthorized: Invalid or missing token")
+    signed = verify_signed_path(file_path, exp, sig)
+
+    current_user: Optional[User] = None
+    if not signed:
+        if not token:
+            raise HTTPException(
+                status_code=401,
+                detail="Unauthorized: Invalid or missing token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        current_user = await run_in_threadpool(authenticate_token, token, db)
+
     # Normalisasi path (hilangkan leading slash jika ada)
     file_path = file_path.lstrip('/')
     
@@ -31,12 +61,15 @@ async def protected_file(
     
     physical_path = os.path.join("uploads", file_path)
 
-    if not os.path.isfile(physical_path):
-        raise HTTPException(status_code=200, detail="File not found")
-
     # Proteksi berdasarkan jenis file
     if file_path.startswith("users/"):
-        # File user hanya bisa diakses oleh pemilik atau admin
+        # File user hanya bisa diakses oleh pemilik atau admin, walau URL bertanda tangan
+        if current_user is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Unauthorized: Invalid or missing token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
         parts = file_path.split('/')
         if len(parts) >= 2 and parts[1].isdigit():
             user_id = int(parts[1])
@@ -46,6 +79,10 @@ async def protected_file(
                     detail="Forbidden: You can only access your own files"
                 )
 
+    elif signed:
+        # Signed URL sudah diotorisasi saat dibuat (sign_url tidak menandatangani users/)
+        pass
+
     elif file_path.startswith("events/"):
         if current_user is None:
             raise HTTPException(
@@ -67,6 +104,17 @@ async def protected_file(
                 detail="Unauthorized: Authentication required"
             )
 
-    response = FileResponse(physical_path)
-    response.headers["Cache-Control"] = "private, max-age=3600"
-    return response
\ No newline at end of file
+    # Request kondisional dijawab 304 dari cache metadata, tanpa I/O disk
+    metadata = get_cached_metadata(physical_path)
+    if metadata and is_not_modified(metadata, request.headers):
+        return Response(status_code=304, headers=_validator_headers(metadata))
+
+    metadata = await run_in_threadpool(load_metadata, physical_path)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if is_not_modified(metadata, request.headers):
+        return Response(status_code=304, headers=_validator_headers(metadata))
+
+    # FileResponse menangani Range / If-Range (206) memakai ETag di atas
+    return FileResponse(physical_path, headers=_validator_headers(metadata))
\ No newline at end of file
@@ -1,21 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
-from core.database import get_db, admin_required
+from core.cache import response_cache
+from core.database import SessionLocal, get_db, get_async_db, admin_required
 from core.security import verify_token
+from core.utils.export_stream import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, stream_csv, stream_xlsx
+from core.utils.pagination import decode_cursor, split_page
 from ..models.finance import Finance
 from ..models.user import User
-from ..schemas.finance import FinanceCreate, FinanceResponseDetail, FinanceUpdate, FinanceResponse, FinanceHistoryResponse, PaginatedFinanceResponse
+from .finance_service import apply_create, apply_update, apply_delete, ledger_query, summary_query
+from ..schemas.finance import FinanceCreate, FinanceResponseDetail, FinanceUpdate, FinanceResponse, FinanceHistoryResponse, PaginatedFinanceResponse, FinanceSummaryResponse
 from fastapi import Query
 
 router = APIRouter()
 
-def get_current_balance(db: Session):
-    last_transaction = db.query(Finance).order_by(Finance.date.desc(), Finance.id.desc()).first()
-    return last_transaction.balance_after if last_transaction else Decimal('0')
+async def get_current_balance_async(db: AsyncSession):
+    balance = await db.scalar(
+        select(Finance.balance_after).order_by(Finance.date.desc(), Finance.id.desc()).limit(1)
+    )
+    return balance if balance is not None else Decimal('0')
+
+async def fetch_ledger_page(db: AsyncSession, query, offset: int, limit: int):
+    """Ambil satu halaman buku kas beserta saldo terkini dalam satu query."""
+    result = await db.execute(query.offset(offset).limit(limit))
+    transactions = [dict(row) for row in result.mappings()]
+
+    if transactions:
+        current_balance = transactions[0]["current_balance"]
+        for transaction in transactions:
+            del transaction["current_balance"]
+    else:
+        current_balance = await get_current_balance_async(db)
+    return transactions, current_balance or Decimal('0')
 
 @router.post("/", response_model=FinanceResponse)
 @admin_required()
@@ -24,21 +45,16 @@ async def create_finance(
     current_user: User = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
-    # Ambil saldo terakhir sebagai balance_before
-    balance_before = get_current_balance(db)
-    
-    # Hitung balance_after
-    balance_after = balance_before + finance.amount if finance.category == "Pemasukan" else balance_before - finance.amount
-
-    # Simpan transaksi
+    # Simpan transaksi pada posisinya di buku kas (transaksi bertanggal mundur
+    # ikut menggeser saldo transaksi sesudahnya)
     db_finance = Finance(
         **finance.dict(),
-        balance_after=balance_after,
         created_by=current_user.id
     )
-    db.add(db_finance)
+    balance_before = apply_create(db, db_finance)
     db.commit()
     db.refresh(db_finance)
+    await response_cache.evict("finance")
     
     # Tambahkan balance_before ke response
     response = FinanceResponse(
@@ -55,50 +71,16 @@ async def get_finance_history(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Query dasar
-    query = db.query(Finance)
-    
-    # Filter
-    if category:
-        query = query.filter(Finance.category == category)
-    if start_date:
-        query = query.filter(Finance.date >= start_date)
-    if end_date:
-        query = query.filter(Finance.date <= end_date)
-    
-    # Eksekusi query
-    transactions = query.order_by(Finance.date.desc(), Finance.id.desc()).offset(skip).limit(limit).all()
-    
-    # Hitung balance_before untuk setiap transaksi
-    transactions_with_balance = []
-    for i, transaction in enumerate(transactions):
-        if i == 0:
-            # Untuk transaksi terbaru, balance_before adalah balance_after dari transaksi sebelumnya
-            prev_transaction = db.query(Finance)\
-                .filter(
-                    (Finance.date < transaction.date) |
-                    ((Finance.date == transaction.date) & (Finance.id < transaction.id))
-                )\
-                .order_by(Finance.date.desc(), Finance.id.desc())\
-                .first()
-            balance_before = prev_transaction.balance_after if prev_transaction else Decimal('0')
-        else:
-            # Untuk transaksi lainnya, balance_before adalah balance_after dari transaksi sebelumnya dalam hasil
-            balance_before = transactions[i-1].balance_after
-            
-        transactions_with_balance.append(
-            FinanceResponse(
-                **transaction.__dict__,
-                balance_before=balance_before
-            )
-        )
-    
-    return FinanceHistoryResponse(
-        transactions=transactions_with_balance,
-        current_balance=get_current_balance(db)
-    )
+    # balance_before dihitung di database pada query yang sama
+    query, _ = ledger_query(category, start_date, end_date)
+    transactions, current_balance = await fetch_ledger_page(db, query, skip, limit)
+
+    return {
+        "transactions": transactions,
+        "current_balance": current_balance
+    }
 
 
 @router.get("/history/page", response_model=PaginatedFinanceResponse)
@@ -108,105 +90,119 @@ async def get_finance_history_paginated(
     category: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="Cursor dari meta.next_cursor; jika diisi, page diabaikan"),
+    include_total: bool = Query(True, description="Hitung total (COUNT) transaksi sesuai filter"),
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    offset = (page - 1) * limit
-
-    # Query dasar
-    query = db.query(Finance)
-
-    # Filter opsional
-    if category:
-        query = query.filter(Finance.category == category)
-    if start_date:
-        query = query.filter(Finance.date >= start_date)
-    if end_date:
-        query = query.filter(Finance.date <= end_date)
-
-    # Total sebelum pagination
-    total = query.count()
-
-    # Ambil data sesuai halaman
-    transactions = (
-        query.order_by(Finance.date.desc(), Finance.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
-
-    # Hitung balance_before
-    transactions_with_balance = []
-    for i, transaction in enumerate(transactions):
-        if i == 0:
-            prev_transaction = (
-                db.query(Finance)
-                .filter(
-                    (Finance.date < transaction.date)
-                    | ((Finance.date == transaction.date) & (Finance.id < transaction.id))
-                )
-                .order_by(Finance.date.desc(), Finance.id.desc())
-                .first()
-            )
-            balance_before = prev_transaction.balance_after if prev_transaction else Decimal("0")
-        else:
-            balance_before = transactions[i - 1].balance_after
-
-        transactions_with_balance.append(
-            FinanceResponse(**transaction.__dict__, balance_before=balance_before)
-        )
-
-    # Hitung total halaman (dibulatkan ke atas)
-    total_pages = (total + limit - 1) // limit
+    # Ambil data sesuai halaman (limit + 1 untuk mendeteksi halaman berikutnya),
+    # balance_before dihitung di query yang sama. Dengan cursor, OFFSET tidak dipakai.
+    position = decode_cursor(cursor) if cursor else None
+    offset = 0 if position else (page - 1) * limit
+    ledger_page, _ = ledger_query(category, start_date, end_date, before=position)
+    transactions, current_balance = await fetch_ledger_page(db, ledger_page, offset, limit + 1)
+    transactions, next_cursor = split_page(transactions, limit, lambda t: (t["date"], t["id"]))
+
+    # Total sebelum pagination (opsional)
+    total = None
+    if include_total:
+        query = select(func.count()).select_from(Finance)
+        if category:
+            query = query.where(Finance.category == category)
+        if start_date:
+            query = query.where(Finance.date >= start_date)
+        if end_date:
+            query = query.where(Finance.date <= end_date)
+        total = await db.scalar(query)
 
     # Return response dengan meta
     return {
-        "data": transactions_with_balance,
+        "data": transactions,
         "meta": {
             "page": page,
             "limit": limit,
             "total": total,
-            "total_pages": total_pages,
-            "current_balance": get_current_balance(db)
+            "total_pages": (total + limit - 1) // limit if total is not None else None,  # dibulatkan ke atas
+            "next_cursor": next_cursor,
+            "current_balance": current_balance
         },
     }
 
 
-@router.get("/summary")
+@router.get("/summary", response_model=FinanceSummaryResponse)
 async def get_finance_summary(
+    request: Request,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Finance)
-    
-    if start_date:
-        query = query.filter(Finance.date >= start_date)
-    if end_date:
-        query = query.filter(Finance.date <= end_date)
-
-    income = query.filter(Finance.category == "Pemasukan")\
-        .with_entities(func.sum(Finance.amount))\
-        .scalar() or Decimal('0')
-        
-    expense = query.filter(Finance.category == "Pengeluaran")\
-        .with_entities(func.sum(Finance.amount))\
-        .scalar() or Decimal('0')
+    if cached := await response_cache.get(request):
+        return cached
+
+    # Bulan penuh dari rollup bulanan, sisa hari di tepi rentang dari tabel finances
+    totals = dict((await db.execute(summary_query(start_date, end_date))).all())
+    income = totals.get("Pemasukan") or Decimal('0')
+    expense = totals.get("Pengeluaran") or Decimal('0')
+
+    return await response_cache.store(request, FinanceSummaryResponse, {
+        "total_income": income,
+        "total_expense": expense,
+        "balance": income - expense
+    }, tags=("finance",))
+
+EXPORT_COLUMNS = ("id", "date", "category", "title", "description", "amount", "balance_before", "balance_after")
+EXPORT_HEADERS = ("ID", "Tanggal", "Kategori", "Judul", "Keterangan", "Nominal", "Saldo Sebelum", "Saldo Sesudah")
+EXPORT_BATCH_SIZE = 1000
+
+def iter_export_rows(query):
+    """
+    Baris buku kas sebagai tuple, dibaca dengan server-side cursor per batch.
+    Session dibuka sendiri karena dependency get_db sudah ditutup sebelum
+    StreamingResponse selesai mengirim body.
+    """
+    db = SessionLocal()
+    try:
+        for batch in db.execute(query).partitions():
+            yield from batch
+    finally:
+        db.close()
+
+@router.get("/export")
+async def export_finance(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(verify_token)
+):
+    """Unduh buku kas (CSV/XLSX) dengan saldo berjalan, di-stream tanpa memuat semua baris."""
+    query, columns = ledger_query(category, start_date, end_date)
+    query = (query.with_only_columns(*(columns[name] for name in EXPORT_COLUMNS))
+             .order_by(None)
+             .order_by(Finance.date.asc(), Finance.id.asc())
+             .execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    rows = iter_export_rows(query)
+    if format == "xlsx":
+        body, media_type = stream_xlsx(rows, EXPORT_HEADERS, sheet_name="Buku Kas"), XLSX_MEDIA_TYPE
+    else:
+        body, media_type = stream_csv(rows, EXPORT_HEADERS), CSV_MEDIA_TYPE
 
-    return {
-        "total_income": float(income),
-        "total_expense": float(expense),
-        "balance": float(income - expense)
-    }
+    filename = f"buku-kas-{datetime.now():%Y%m%d}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/{finance_id}", response_model=FinanceResponseDetail)
 async def get_finance(
     finance_id: int,
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    finance = db.query(Finance).filter(Finance.id == finance_id).first()
+    finance = await db.get(Finance, finance_id)
     if not finance:
         raise HTTPException(status_code=404, detail="Finance record not found")
     # Return response without balance_before
@@ -227,53 +223,12 @@ async def update_finance(
     if not db_finance:
         raise HTTPException(status_code=404, detail="Finance record not found")
 
-    # Simpan nilai lama untuk perhitungan
-    old_amount = db_finance.amount
-    old_category = db_finance.category
-    old_date = db_finance.date
-
-    # Dapatkan nilai baru dari request
-    new_amount = finance_update.amount if finance_update.amount is not None else old_amount
-    new_category = finance_update.category if finance_update.category is not None else old_category
-    new_date = finance_update.date if finance_update.date is not None else old_date
-
-    # 1. Dapatkan transaksi sebelumnya (untuk menghitung balance_before)
-    prev_transaction = db.query(Finance).filter(
-        (Finance.date < old_date) |
-        ((Finance.date == old_date) & (Finance.id < db_finance.id))
-    ).order_by(Finance.date.desc(), Finance.id.desc()).first()
-
-    balance_before = prev_transaction.balance_after if prev_transaction else Decimal('0')
-
-    # 2. Hitung ulang saldo untuk transaksi ini dan semua transaksi setelahnya
-    transactions_to_update = db.query(Finance).filter(
-        (Finance.date > old_date) |
-        ((Finance.date == old_date) & (Finance.id >= db_finance.id))
-    ).order_by(Finance.date.asc(), Finance.id.asc()).all()
-
-    # 3. Update transaksi ini
-    for field, value in finance_update.dict(exclude_unset=True).items():
-        setattr(db_finance, field, value)
-
-    # Hitung balance_after baru untuk transaksi ini
-    if new_category == "Pemasukan":
-        db_finance.balance_after = balance_before + new_amount
-    else:
-        db_finance.balance_after = balance_before - new_amount
-
-    current_balance = db_finance.balance_after
-
-    # 4. Update semua transaksi setelahnya
-    for transaction in transactions_to_update[1:]:  # Skip transaksi pertama (yang sedang diupdate)
-        if transaction.category == "Pemasukan":
-            current_balance += transaction.amount
-        else:
-            current_balance -= transaction.amount
-        
-        transaction.balance_after = current_balance
+    # Update transaksi dan geser saldo transaksi sesudahnya dengan satu UPDATE
+    balance_before = apply_update(db, db_finance, finance_update.dict(exclude_unset=True))
 
     db.commit()
     db.refresh(db_finance)
+    await response_cache.evict("finance")
 
     # Siapkan response dengan balance_before
     response = FinanceResponse(
@@ -294,27 +249,9 @@ async def delete_finance(
     if not finance:
         raise HTTPException(status_code=404, detail="Finance record not found")
 
-    # Ambil saldo terakhir
-    last_balance = db.query(Finance.balance_after).order_by(Finance.date.desc()).first()
-    last_balance = last_balance[0] if last_balance else Decimal('0')
-
-    # Hitung saldo baru setelah penghapusan
-    if finance.category == "Pemasukan":
-        new_balance = last_balance - finance.amount
-    else:
-        new_balance = last_balance + finance.amount
-
-    # Hapus transaksi
-    db.delete(finance)
+    # Hapus transaksi dan koreksi saldo transaksi sesudahnya
+    apply_delete(db, finance)
     db.commit()
+    await response_cache.evict("finance")
 
-    if (
-        last_transaction := db.query(Finance)
-        .order_by(Finance.date.desc())
-        .first()
-    ):
-        last_transaction.balance = new_balance
-        db.commit()
-        db.refresh(last_transaction)
-
-    return {"message": "Finance record deleted"}
+    return {"message": "Finance record deleted"}
\ No newline at end of file
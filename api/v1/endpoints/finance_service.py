@@ -0,0 +1,349 @@
+"""
+Pemeliharaan saldo berjalan (balance_after) pada tabel finances.
+
+Urutan buku kas adalah (date, id). Setiap perubahan transaksi hanya
+menggeser saldo transaksi sesudahnya dengan satu UPDATE berbasis set,
+tanpa memuat baris-baris tersebut ke Python.
+
+Total per bulan & kategori (finance_monthly_summary) ikut dijaga di
+transaksi yang sama, sehingga ringkasan keuangan tidak perlu SUM atas
+seluruh tabel finances.
+
+Rebuild penuh (dengan verifikasi) bisa dijalankan dari command line:
+
+    python -m api.v1.endpoints.finance_service --check     # hanya periksa
+    python -m api.v1.endpoints.finance_service             # perbaiki saldo
+    python -m api.v1.endpoints.finance_service --summary   # bangun ulang rollup bulanan
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Optional
+from sqlalchemy import and_, case, delete, func, insert, or_, select, union_all, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from core.utils.pagination import Position, keyset_before
+from ..models.finance import Finance, FinanceMonthlySummary
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def signed_amount(category: str, amount: Decimal) -> Decimal:
+    """Nilai transaksi terhadap saldo: positif untuk Pemasukan, negatif untuk Pengeluaran."""
+    return amount if category == "Pemasukan" else -amount
+
+
+def _before(date, finance_id):
+    return or_(Finance.date < date, and_(Finance.date == date, Finance.id < finance_id))
+
+
+def _after(date, finance_id):
+    return or_(Finance.date > date, and_(Finance.date == date, Finance.id > finance_id))
+
+
+def balance_before(db: Session, date, finance_id: int) -> Decimal:
+    """
+    balance_after dari transaksi tepat sebelum posisi (date, finance_id).
+    Baris finance_id sendiri selalu dikecualikan: saat transaksi dipindah ke
+    tanggal lain, baris di DB masih berada di posisi lama dengan saldo lama.
+    """
+    balance = db.scalar(
+        select(Finance.balance_after)
+        .where(_before(date, finance_id), Finance.id != finance_id)
+        .order_by(Finance.date.desc(), Finance.id.desc())
+        .limit(1)
+    )
+    return balance if balance is not None else Decimal("0")
+
+
+def shift_balances_after(db: Session, date, finance_id: int, delta: Decimal) -> int:
+    """
+    Tambahkan `delta` ke balance_after semua transaksi sesudah (date, finance_id).
+    Baris finance_id sendiri dikecualikan: saat dipindah, tanggal barunya belum
+    di-flush sehingga di DB baris itu masih bisa cocok dengan posisi lain.
+    """
+    if not delta:
+        return 0
+    result = db.execute(
+        update(Finance)
+        .where(_after(date, finance_id), Finance.id != finance_id)
+        .values(balance_after=Finance.balance_after + delta)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def adjust_monthly_summary(db: Session, when, category: str, amount: Decimal, count: int) -> None:
+    """Tambahkan amount/count ke rollup bulan `when` (satu upsert, atomik di MySQL)."""
+    if not amount and not count:
+        return
+    stmt = mysql_insert(FinanceMonthlySummary).values(
+        month=month_start(when), category=category, total=amount, transaction_count=count
+    )
+    db.execute(stmt.on_duplicate_key_update(
+        total=FinanceMonthlySummary.total + stmt.inserted.total,
+        transaction_count=FinanceMonthlySummary.transaction_count + stmt.inserted.transaction_count,
+    ))
+
+
+def apply_create(db: Session, finance: Finance) -> Decimal:
+    """
+    Sisipkan transaksi baru ke buku kas, termasuk transaksi bertanggal mundur.
+    Mengembalikan balance_before transaksi tersebut. Commit dilakukan pemanggil.
+    """
+    finance.balance_after = Decimal("0")
+    db.add(finance)
+    db.flush()  # butuh id untuk menentukan posisi (date, id)
+
+    amount = signed_amount(finance.category, finance.amount)
+    before = balance_before(db, finance.date, finance.id)
+    finance.balance_after = before + amount
+    shift_balances_after(db, finance.date, finance.id, amount)
+    adjust_monthly_summary(db, finance.date, finance.category, finance.amount, 1)
+    db.flush()
+    return before
+
+
+def apply_update(db: Session, finance: Finance, changes: Dict) -> Decimal:
+    """
+    Terapkan perubahan pada transaksi dan geser saldo transaksi sesudahnya.
+    Mengembalikan balance_before transaksi setelah update. Commit dilakukan pemanggil.
+    """
+    old_date = finance.date
+    old_category, old_value = finance.category, finance.amount
+    old_amount = signed_amount(finance.category, finance.amount)
+
+    for field, value in changes.items():
+        setattr(finance, field, value)
+
+    new_amount = signed_amount(finance.category, finance.amount)
+
+    if finance.date == old_date:
+        # Posisi tetap: cukup satu UPDATE dengan selisih nominal
+        delta = new_amount - old_amount
+        finance.balance_after = finance.balance_after + delta
+        shift_balances_after(db, old_date, finance.id, delta)
+        before = finance.balance_after - new_amount
+    else:
+        # Posisi berubah: keluarkan dari posisi lama, lalu sisipkan di posisi baru
+        shift_balances_after(db, old_date, finance.id, -old_amount)
+        before = balance_before(db, finance.date, finance.id)
+        finance.balance_after = before + new_amount
+        shift_balances_after(db, finance.date, finance.id, new_amount)
+
+    if (month_start(old_date), old_category) == (month_start(finance.date), finance.category):
+        adjust_monthly_summary(db, finance.date, finance.category, finance.amount - old_value, 0)
+    else:
+        adjust_monthly_summary(db, old_date, old_category, -old_value, -1)
+        adjust_monthly_summary(db, finance.date, finance.category, finance.amount, 1)
+
+    db.flush()
+    return before
+
+
+def apply_delete(db: Session, finance: Finance) -> None:
+    """Hapus transaksi dan kurangi pengaruhnya dari saldo transaksi sesudahnya."""
+    shift_balances_after(
+        db, finance.date, finance.id, -signed_amount(finance.category, finance.amount)
+    )
+    adjust_monthly_summary(db, finance.date, finance.category, -finance.amount, -1)
+    db.delete(finance)
+    db.flush()
+
+
+def ledger_query(
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    before: Optional[Position] = None,
+):
+    """
+    SELECT buku kas (terbaru dulu) beserta balance_before dan saldo terkini,
+    sehingga satu halaman cukup satu round trip. Mengembalikan (query, kolom)
+    dengan kolom = {nama: ekspresi} untuk memilih subset kolom (mis. ekspor).
+
+    balance_before diturunkan dari baris itu sendiri (balance_after dikurangi
+    nilai transaksinya), tanpa window function, sehingga filter, ORDER BY
+    (date, id) dan LIMIT langsung memakai indeks dan hanya membaca baris
+    halaman yang diminta.
+    """
+    columns = {column.key: column for column in Finance.__table__.columns}
+    columns["balance_before"] = (
+        Finance.balance_after
+        - case((Finance.category == "Pemasukan", Finance.amount), else_=-Finance.amount)
+    ).label("balance_before")
+
+    current_balance = (
+        select(Finance.balance_after)
+        .order_by(Finance.date.desc(), Finance.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    query = select(*columns.values(), current_balance.label("current_balance"))
+    if category:
+        query = query.where(Finance.category == category)
+    if start_date:
+        query = query.where(Finance.date >= start_date)
+    if end_date:
+        query = query.where(Finance.date <= end_date)
+    if before:
+        query = query.where(keyset_before(Finance.date, Finance.id, before))
+    return query.order_by(Finance.date.desc(), Finance.id.desc()), columns
+
+
+def summary_query(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """
+    SELECT (category, total) untuk transaksi dalam [start_date, end_date].
+
+    Bulan yang tercakup penuh oleh rentang diambil dari finance_monthly_summary;
+    tabel finances hanya dibaca untuk sisa hari di awal dan akhir rentang.
+    """
+    # Bulan penuh pertama: bulan start_date jika dimulai tepat tanggal 1 00:00,
+    # selain itu bulan berikutnya
+    full_from = None
+    if start_date:
+        full_from = month_start(start_date)
+        if (start_date.day, start_date.time()) != (1, time.min):
+            full_from = _next_month(full_from)
+
+    # Batas eksklusif bulan penuh terakhir. DATETIME berpresisi detik, jadi bulan
+    # end_date tercakup penuh jika end_date + 1 detik sudah masuk bulan berikutnya
+    full_to = month_start(end_date + timedelta(seconds=1)) if end_date else None
+
+    if full_from and full_to and full_from >= full_to:
+        # Rentang di dalam satu bulan: tidak ada bulan penuh
+        rows = (select(Finance.category, Finance.amount.label("amount"))
+                .where(Finance.date >= start_date, Finance.date <= end_date))
+    else:
+        rollup = select(FinanceMonthlySummary.category, FinanceMonthlySummary.total.label("amount"))
+        edges = []
+        if full_from:
+            rollup = rollup.where(FinanceMonthlySummary.month >= full_from)
+            edges.append(and_(Finance.date >= start_date,
+                              Finance.date < datetime.combine(full_from, time.min)))
+        if full_to:
+            rollup = rollup.where(FinanceMonthlySummary.month < full_to)
+            edges.append(and_(Finance.date >= datetime.combine(full_to, time.min),
+                              Finance.date <= end_date))
+        rows = rollup
+        if edges:
+            rows = union_all(
+                rollup,
+                select(Finance.category, Finance.amount.label("amount")).where(or_(*edges))
+            )
+
+    rows = rows.subquery("summary_rows")
+    return (select(rows.c.category, func.sum(rows.c.amount).label("total"))
+            .group_by(rows.c.category))
+
+
+def rebuild_monthly_summary(db: Session) -> int:
+    """Bangun ulang finance_monthly_summary dari tabel finances. Mengembalikan jumlah baris."""
+    year, month = func.year(Finance.date), func.month(Finance.date)
+    rows = [
+        {"month": date(row_year, row_month, 1), "category": category,
+         "total": total, "transaction_count": count}
+        for row_year, row_month, category, total, count in db.execute(
+            select(year, month, Finance.category, func.sum(Finance.amount), func.count(Finance.id))
+            .group_by(year, month, Finance.category)
+        )
+    ]
+    try:
+        db.execute(delete(FinanceMonthlySummary))
+        if rows:
+            db.execute(insert(FinanceMonthlySummary), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+def ensure_monthly_summary(db: Session) -> None:
+    """Isi rollup bulanan sekali jika tabelnya baru dibuat (kosong) padahal transaksi sudah ada."""
+    if db.scalar(select(FinanceMonthlySummary.month).limit(1)) is not None:
+        return
+    if db.scalar(select(Finance.id).limit(1)) is None:
+        return
+    try:
+        rebuild_monthly_summary(db)
+    except IntegrityError:
+        pass  # worker lain sudah mengisinya
+
+
+def _find_mismatches(db: Session):
+    running_balance = func.sum(
+        case((Finance.category == "Pemasukan", Finance.amount), else_=-Finance.amount)
+    ).over(order_by=(Finance.date, Finance.id))
+
+    rows = db.execute(
+        select(Finance.id, Finance.balance_after, running_balance.label("expected"))
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    return [
+        {"id": finance_id, "balance_after": expected}
+        for finance_id, current, expected in rows
+        if current != expected
+    ]
+
+
+def rebuild_balances(db: Session, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Hitung ulang seluruh balance_after dari awal dengan window function,
+    perbaiki baris yang salah, lalu verifikasi ulang sebelum commit.
+    """
+    mismatches = _find_mismatches(db)
+    report = {"mismatched": len(mismatches), "corrected": 0}
+    if dry_run or not mismatches:
+        return report
+
+    try:
+        for start in range(0, len(mismatches), REBUILD_BATCH_SIZE):
+            db.execute(update(Finance), mismatches[start:start + REBUILD_BATCH_SIZE])
+
+        remaining = _find_mismatches(db)
+        if remaining:
+            raise RuntimeError(
+                f"Verifikasi saldo gagal: {len(remaining)} transaksi masih tidak sesuai"
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    report["corrected"] = len(mismatches)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    from core.database import SessionLocal
+    from core.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Rebuild saldo berjalan tabel finances")
+    parser.add_argument("--check", action="store_true", help="Hanya periksa, jangan ubah data")
+    parser.add_argument("--summary", action="store_true", help="Bangun ulang finance_monthly_summary")
+    args = parser.parse_args()
+    setup_logging()
+
+    session = SessionLocal()
+    try:
+        if args.summary:
+            logger.info("Baris rollup bulanan: %s", rebuild_monthly_summary(session))
+        else:
+            result = rebuild_balances(session, dry_run=args.check)
+            logger.info("Transaksi tidak sesuai: %s, diperbaiki: %s", result["mismatched"], result["corrected"])
+    finally:
+        session.close()
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from typing import List, Optional
 from datetime import date, datetime
 from core.database import get_db, admin_required
-from core.security import verify_token
+from core.passwords import hash_password
+from core.rate_limit import login_guard
+from core.security import verify_token, invalidate_principal, invalidate_token_version
+from core.utils.search import fulltext_match
 from ..models.user import User as UserModel, Member  # SQLAlchemy models
 from ..schemas.user import User, MemberResponse, MemberCreate, MemberUpdate, UserCreate  # Pydantic schemas
 from dateutil.relativedelta import relativedelta
@@ -24,7 +27,10 @@ async def get_all_members(
     db: Session = Depends(get_db),
     current_user: User = Depends(verify_token)
 ):
-    query = db.query(UserModel).join(Member).filter(UserModel.role == "Member")
+    query = (db.query(UserModel)
+             .join(Member)
+             .options(contains_eager(UserModel.member_info))  # hindari N+1 pada user.member_info
+             .filter(UserModel.role == "Member"))
 
     if age_gt is not None:
         today = datetime.now()
@@ -49,13 +55,19 @@ async def search_members(
     name: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(UserModel).join(Member).filter(UserModel.role == "Member")
+    query = (db.query(UserModel)
+             .join(Member)
+             .options(contains_eager(UserModel.member_info))  # hindari N+1 pada user.member_info
+             .filter(UserModel.role == "Member"))
 
-    if name:
-        search_pattern = f"%{name}%"
-        query = query.filter(Member.full_name.ilike(search_pattern))
-
-    query = query.order_by(Member.full_name.asc())
+    relevance = fulltext_match((Member.full_name,), name) if name else None
+    if relevance is not None:
+        query = query.filter(relevance).order_by(relevance.desc(), Member.full_name.asc())
+    elif name:
+        # Nama terlalu pendek untuk indeks FULLTEXT: prefix LIKE
+        query = query.filter(Member.full_name.ilike(f"{name}%")).order_by(Member.full_name.asc())
+    else:
+        query = query.order_by(Member.full_name.asc())
     
     users = query.all()
     return [
@@ -103,12 +115,14 @@ async def create_user_account(
     # Membuat User baru
     new_user = UserModel(
         username=user_data.username,
-        password=user_data.password,  # Hash password sebelum disimpan
+        password=await hash_password(user_data.password),  # Hash password sebelum disimpan
         role="Member",  # Role untuk member
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_principal(new_user.username)
+    await login_guard.forget_credentials(user_data.username, user_data.password)
 
     # Membuat biodata member
     member = Member(
@@ -222,6 +236,8 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_principal(user.username)
+    invalidate_token_version(user.id)
     
     return {"message": "User deleted successfully"}
 
@@ -246,6 +262,9 @@ async def delete_users_older_than_35(
         db.delete(user)
     
     db.commit()
+    for user in users_to_delete:
+        invalidate_principal(user.username)
+        invalidate_token_version(user.id)
 
     return {"message": f"Successfully deleted {len(users_to_delete)} users older than 35 years."}
 
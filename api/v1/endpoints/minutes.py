@@ -1,12 +1,13 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from ..models.minutes import MeetingMinutes
 from ..models.events import Event  # Import the Event model
 from ..schemas.minutes import MeetingMinutesBase, MeetingMinutesUpdate, MeetingMinutesResponse
+from core.cache import response_cache
 from core.database import get_db, admin_required
 from core.security import verify_token  # Sesuaikan dengan sistem autentikasi Anda
-from .notification_service import send_notification
+from .notification_service import enqueue_broadcast
 from ..models.user import Member, User
 
 router = APIRouter()
@@ -16,7 +17,6 @@ router = APIRouter()
 @admin_required()
 async def create_meeting_minutes(
     meeting_minutes: MeetingMinutesBase,
-    background_tasks: BackgroundTasks, # Tambahkan ini
     current_user: int = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -27,29 +27,33 @@ async def create_meeting_minutes(
 
     new_minutes = MeetingMinutes(**meeting_minutes.dict())
     db.add(new_minutes)
-    db.commit()
-    db.refresh(new_minutes)
 
     # --- Logika Notifikasi Dimulai ---
-    # Kirim notifikasi ke pengguna yang membuat event
-    members = db.query(User).filter(User.role == "Member").all()
-    for member in members:
-        background_tasks.add_task(
-            send_notification,
-            db=db,
-            user_id=member.id,  # type: ignore
-            title=f"Notulensi Baru: {event.title}",
-            content=f"Sebuah notulensi baru telah ditambahkan untuk acara '{event.title}'.",
-            data={"type": "event", "id": str(event.id)}
-        )    # --- Logika Notifikasi Selesai ---
+    # Notifikasi ke semua member, tersimpan dalam transaksi yang sama
+    enqueue_broadcast(
+        db,
+        title=f"Notulensi Baru: {event.title}",
+        content=f"Sebuah notulensi baru telah ditambahkan untuk acara '{event.title}'.",
+        data={"type": "event", "id": str(event.id)}
+    )
+    # --- Logika Notifikasi Selesai ---
+
+    db.commit()
+    db.refresh(new_minutes)
+    await response_cache.evict("minutes")
 
     return new_minutes
 
 # ✅ Get All Meeting Minutes
 @router.get("/", response_model=List[MeetingMinutesResponse])
-async def get_meeting_minutes(db: Session = Depends(get_db),
+async def get_meeting_minutes(request: Request,
+                              db: Session = Depends(get_db),
                               current_user: int = Depends(verify_token)):
-    return db.query(MeetingMinutes).all()
+    if cached := await response_cache.get(request):
+        return cached
+    return await response_cache.store(
+        request, List[MeetingMinutesResponse], db.query(MeetingMinutes).all(), tags=("minutes",)
+    )
 
 # ✅ Get Single Meeting Minutes by ID
 @router.get("/{minutes_id}", response_model=MeetingMinutesResponse)
@@ -84,7 +88,6 @@ async def get_meeting_minutes_by_event_id(
 async def update_meeting_minutes(
     minutes_id: int,
     update_data: MeetingMinutesUpdate,
-    background_tasks: BackgroundTasks, # Tambahkan ini
     db: Session = Depends(get_db),
     current_user: int = Depends(verify_token)
 ):
@@ -101,26 +104,23 @@ async def update_meeting_minutes(
     for key, value in update_data.dict(exclude_unset=True).items():
         setattr(meeting, key, value)
 
-    db.commit()
-    db.refresh(meeting)
-
     # --- Logika Notifikasi Dimulai ---
     # Dapatkan data event terbaru untuk notifikasi
     final_event = db.query(Event).filter(Event.id == meeting.event_id).first()
     if not final_event:
         raise HTTPException(status_code=404, detail="Event not found")
-    members = db.query(User).filter(User.role == "Member").all()
-    for member in members:
-        background_tasks.add_task(
-            send_notification,
-            db=db,
-            user_id=member.id,  # type: ignore
-            title=f"Notulensi Diperbarui: {final_event.title}",
-            content=f"Notulensi untuk acara '{final_event.title}' telah diperbarui.",
-            data={"type": "event", "id": str(event.id)}
-        )
+    enqueue_broadcast(
+        db,
+        title=f"Notulensi Diperbarui: {final_event.title}",
+        content=f"Notulensi untuk acara '{final_event.title}' telah diperbarui.",
+        data={"type": "event", "id": str(final_event.id)}
+    )
     # --- Logika Notifikasi Selesai ---
 
+    db.commit()
+    db.refresh(meeting)
+    await response_cache.evict("minutes")
+
     return meeting
 
 # ✅ Delete Meeting Minutes
@@ -135,4 +135,5 @@ async def delete_meeting_minutes(minutes_id: int, db: Session = Depends(get_db),
 
     db.delete(meeting)
     db.commit()
+    await response_cache.evict("minutes")
     return {"message": "Meeting minutes deleted successfully"}
\ No newline at end of file
@@ -1,19 +1,22 @@
 import json
 from pathlib import Path
 import uuid
-from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, UploadFile, File
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from api.v1.endpoints.notification_service import send_notification
-from core.database import get_db, admin_required
+from api.v1.endpoints.notification_service import enqueue_broadcast
+from core.cache import response_cache
+from core.database import get_db, get_async_db, admin_required
 from core.security import verify_token
 from ..models.user import User
 from ..models.news import News, NewsPhoto
 from ..schemas.news import NewsCreate, NewsResponse, NewsUpdate, NewsPhotoResponse
 from datetime import datetime
 from core.utils.file_handler import FileHandler
+from core.utils.pagination import decode_cursor, keyset_before, split_page
+from core.utils.search import fulltext_match
 from .uploads import save_multiple_images
 import re
 
@@ -29,33 +32,74 @@ def strip_html_tags(text: str) -> str:
 
 @router.get("/", response_model=List[NewsResponse])
 async def get_all_news(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     is_published: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="Cursor dari header X-Next-Cursor; jika diisi, skip diabaikan"),
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Dapatkan semua berita dengan filter opsional"""
-    query = db.query(News)
+    """
+    Dapatkan semua berita dengan filter opsional.
+    Cursor halaman berikutnya dikirim lewat header X-Next-Cursor.
+    """
+    if cached := await response_cache.get(request):
+        return cached
+
+    query = select(News).options(selectinload(News.photos))
     
     if is_published is not None:
-        query = query.filter(News.is_published == is_published)
+        query = query.where(News.is_published == is_published)
+
+    if cursor:
+        query = query.where(keyset_before(News.date, News.id, decode_cursor(cursor)))
+    else:
+        query = query.offset(skip)
     
-    news_list = query.order_by(News.date.desc()) \
-        .offset(skip) \
-        .limit(limit) \
-        .all()
+    result = await db.execute(
+        query.order_by(News.date.desc(), News.id.desc())
+        .limit(limit + 1)
+    )
+    news_list, next_cursor = split_page(result.scalars().all(), limit, lambda n: (n.date, n.id))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return await response_cache.store(request, List[NewsResponse], news_list, tags=("news",), headers=headers)
+
+@router.get("/search", response_model=List[NewsResponse])
+async def search_news(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    is_published: Optional[bool] = None,
+    current_user: User = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cari berita berdasarkan judul & isi (FULLTEXT, prefix match), urut relevansi"""
+    query = select(News).options(selectinload(News.photos))
 
-    return news_list
+    if is_published is not None:
+        query = query.where(News.is_published == is_published)
+
+    relevance = fulltext_match((News.title, News.description), q)
+    if relevance is not None:
+        query = query.where(relevance).order_by(relevance.desc(), News.date.desc())
+    else:
+        # Kata kunci terlalu pendek untuk indeks FULLTEXT: prefix LIKE pada judul
+        query = query.where(News.title.ilike(f"{q}%")).order_by(News.date.desc())
+
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
 
 @router.get("/{news_id}", response_model=NewsResponse)
 async def get_news_detail(
     news_id: int,
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Dapatkan detail berita beserta foto-fotonya,"""
-    news = db.query(News).filter(News.id == news_id).first()
+    news = await db.scalar(
+        select(News).options(selectinload(News.photos)).where(News.id == news_id)
+    )
     if not news:
         raise HTTPException(status_code=404, detail="News not found")
     
@@ -64,7 +108,6 @@ async def get_news_detail(
 @router.post("/", response_model=NewsResponse)
 @admin_required()
 async def create_news(
-    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: str = Form(...),
     date: datetime = Form(...),
@@ -83,28 +126,27 @@ async def create_news(
             created_by=current_user.id,
         )
         db.add(db_news)
+        db.flush()  # butuh id untuk data notifikasi
+
+        # Kirim notifikasi jika published, tersimpan dalam transaksi yang sama
+        if is_published:
+            normalized_description = strip_html_tags(db_news.description)
+            preview = (normalized_description[:30] + "...") if len(normalized_description) > 30 else normalized_description
+
+            enqueue_broadcast(
+                db,
+                title=f"Berita Baru: {db_news.title}",
+                content=preview,
+                data={"type": "news", "id": str(db_news.id)}
+            )
+
         db.commit()
         db.refresh(db_news)
 
         # Upload foto (jika ada)
         if files:
             await save_multiple_images(db_news.id, files, "news", db)
-
-        # Kirim notifikasi jika published
-        if is_published:
-            members = db.query(User).filter(User.role == "Member").all()
-            normalized_description = strip_html_tags(db_news.description)
-            preview = (normalized_description[:30] + "...") if len(normalized_description) > 30 else normalized_description
-
-            for member in members:
-                background_tasks.add_task(
-                    send_notification,
-                    db=db,
-                    user_id=member.id,
-                    title=f"Berita Baru: {db_news.title}",
-                    content=preview,
-                    data={"type": "news", "id": str(db_news.id)}
-                )
+        await response_cache.evict("news")
 
         return db_news
 
@@ -118,7 +160,6 @@ async def create_news(
 async def update_news(
     news_id: int,
     news_update: NewsUpdate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
@@ -130,24 +171,21 @@ async def update_news(
     for field, value in news_update.dict(exclude_unset=True).items():
         setattr(db_news, field, value)
 
-    db.commit()
-    db.refresh(db_news)
-
     # Kirim notifikasi jika baru dipublish
     if news_update.is_published:
-        members = db.query(User).filter(User.role == "Member").all()
         normalized_description = strip_html_tags(db_news.description)
         preview = (normalized_description[:30] + "...") if len(normalized_description) > 30 else normalized_description
 
-        for member in members:
-            background_tasks.add_task(
-                send_notification,
-                db=db,
-                user_id=member.id,
-                title=f"Berita Terbaru: {db_news.title}",
-                content=preview,
-                data={"type": "news", "id": str(db_news.id)}
-            )
+        enqueue_broadcast(
+            db,
+            title=f"Berita Terbaru: {db_news.title}",
+            content=preview,
+            data={"type": "news", "id": str(db_news.id)}
+        )
+
+    db.commit()
+    db.refresh(db_news)
+    await response_cache.evict("news")
 
     return db_news
 
@@ -255,4 +293,5 @@ async def delete_news(
 
     db.delete(db_news)
     db.commit()
+    await response_cache.evict("news")
     return {"message": "News deleted successfully"}
\ No newline at end of file
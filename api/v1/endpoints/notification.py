@@ -1,41 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from typing import List
-from firebase_admin import credentials, initialize_app, messaging
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from pydantic import BaseModel
-from core.security import verify_token
-from core.database import get_db
+from core.security import verify_token, invalidate_principal
+from core.database import get_db, get_async_db
 from ..models.notification import Notification
 from ..models.user import User
-from ..schemas.notification import NotificationResponse, NotificationCreate, FCMTokenPayload
-import os
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import initialize_app
-from .notification_service import send_notification
-
-load_dotenv()
-
-# Ambil kredensial dari variabel environment
-firebase_cred = {
-    "type": "service_account",
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-    "token_uri": "https://oauth2.googleapis.com/token",
-    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-    "client_x509_cert_url": "https://www.googleapis.com/robot/v1/metadata/x509/firebase-adminsdk-fbsvc%40opn-2da62.iam.gserviceaccount.com",
-}
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate(firebase_cred)
-    initialize_app(cred)
+from ..schemas.notification import (
+    NotificationResponse, NotificationCreate, NotificationMarkRead, UnreadCountResponse, FCMTokenPayload
+)
+from core.utils.pagination import decode_cursor, keyset_before, split_page
+from .notification_service import send_notification, get_unread_count, invalidate_unread_count
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # === Fungsi reusable: Simpan dan kirim notifikasi ===
 
@@ -46,36 +27,82 @@ async def create_notification(
     db: Session = Depends(get_db),
     current_user: User = Depends(verify_token),
 ):
-    print(f"[POST] Create notification: to user {payload.user_id}, from user {current_user.id}")
-    return await send_notification(
+    logger.debug("Create notification: to user %s, from user %s", payload.user_id, current_user.id)
+    return send_notification(
         db=db,
         user_id=payload.user_id,
         title=payload.title,
         content=payload.content
     )
 
-# --- GET: Semua notifikasi milik user
+# --- GET: Inbox notifikasi milik user (terbaru dulu, per halaman)
 @router.get("/", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor dari header X-Next-Cursor"),
+    unread_only: bool = False,
     current_user: User = Depends(verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    print(f"[GET] Fetch notifications for user {current_user.id}")
-    return (
-        db.query(Notification)
-        .filter(Notification.user_id == current_user.id)
-        .order_by(Notification.created_at.desc())
-        .all()
+    """
+    Notifikasi milik user, diurutkan (created_at, id) terbaru dulu memakai indeks
+    (user_id, created_at, id). Cursor halaman berikutnya dikirim lewat header X-Next-Cursor.
+    """
+    query = select(Notification).where(Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.where(Notification.is_read.is_(False))
+    if cursor:
+        query = query.where(keyset_before(Notification.created_at, Notification.id, decode_cursor(cursor)))
+
+    result = await db.execute(
+        query.order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(limit + 1)
+    )
+    notifications, next_cursor = split_page(
+        result.scalars().all(), limit, lambda n: (n.created_at, n.id)
     )
 
-# --- POST: Tandai notifikasi terbaca (hapus dari DB)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return notifications
+
+# --- GET: Jumlah notifikasi belum dibaca (badge)
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_notification_unread_count(
+    current_user: User = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return {"unread_count": await get_unread_count(db, current_user.id)}
+
+# --- POST: Tandai banyak notifikasi terbaca sekaligus (satu UPDATE)
+@router.post("/read")
+async def mark_notifications_as_read(
+    payload: NotificationMarkRead,
+    current_user: User = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    query = (update(Notification)
+             .where(Notification.user_id == current_user.id, Notification.is_read.is_(False))
+             .values(is_read=True)
+             .execution_options(synchronize_session=False))
+    if payload.ids is not None:
+        if not payload.ids:
+            return {"updated": 0}
+        query = query.where(Notification.id.in_(payload.ids))
+
+    result = await db.execute(query)
+    await db.commit()
+    invalidate_unread_count(current_user.id)
+    return {"updated": result.rowcount}
+
+# --- POST: Tandai satu notifikasi terbaca
 @router.post("/{notification_id}/read", response_model=NotificationResponse)
 async def mark_notification_as_read(
     notification_id: int,
     current_user: User = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
-    print(f"[POST] Mark as read & delete: user {current_user.id}, notif {notification_id}")
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
@@ -84,8 +111,11 @@ async def mark_notification_as_read(
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
 
-    db.delete(notification)
-    db.commit()
+    if not notification.is_read:
+        notification.is_read = True
+        db.commit()
+        db.refresh(notification)
+        invalidate_unread_count(current_user.id)
     return notification
 
 # --- POST: Simpan token FCM user
@@ -101,5 +131,6 @@ def update_fcm_token(
 
     user.fcm_token = payload.token
     db.commit()
-    print(f"[FCM] Token updated for user {user.id}")
+    invalidate_principal(user.username)
+    logger.debug("FCM token updated for user %s", user.id)
     return {"message": "FCM token updated"}
@@ -1,59 +1,137 @@
+"""
+Notifikasi in-app dan antrean push.
+
+Baris Notification (inbox) dan NotificationOutbox (push FCM) ditambahkan ke
+session pemanggil tanpa commit, sehingga tersimpan atomik bersama perubahan
+data yang memicunya. Pengiriman push dilakukan oleh outbox_worker, bukan di
+jalur request.
+"""
+import os
+import threading
+from datetime import datetime
 from typing import Optional, Dict, List
+from cachetools import TTLCache
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..models.notification import Notification
+from ..models.notification import Notification, NotificationOutbox
 from ..models.user import User
-from firebase_admin import messaging
 
-async def send_notification(
+# Cache jumlah notifikasi belum dibaca per user (badge aplikasi mobile)
+UNREAD_COUNT_CACHE_TTL = int(os.getenv("UNREAD_COUNT_CACHE_TTL", "30"))          # detik
+UNREAD_COUNT_CACHE_MAXSIZE = int(os.getenv("UNREAD_COUNT_CACHE_MAXSIZE", "4096"))
+
+_unread_count_cache = TTLCache(maxsize=UNREAD_COUNT_CACHE_MAXSIZE, ttl=UNREAD_COUNT_CACHE_TTL)
+_unread_count_lock = threading.Lock()
+
+
+async def get_unread_count(db: AsyncSession, user_id: int) -> int:
+    """Jumlah notifikasi belum dibaca, dari cache atau COUNT pada indeks (user_id, is_read)."""
+    with _unread_count_lock:
+        cached = _unread_count_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    count = await db.scalar(
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+    )
+    with _unread_count_lock:
+        _unread_count_cache[user_id] = count
+    return count
+
+
+def invalidate_unread_count(user_id: Optional[int] = None) -> None:
+    """Hapus cache unread count. Tanpa user_id, seluruh cache dikosongkan (mis. setelah broadcast)."""
+    with _unread_count_lock:
+        if user_id is None:
+            _unread_count_cache.clear()
+        else:
+            _unread_count_cache.pop(user_id, None)
+
+
+def _build_fcm_payload(title: str, content: str, data: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    # Payload data dasar dengan judul dan isi, ditambah data navigasi (tipe & id) jika ada
+    payload = {
+        "title": title,
+        "body": content
+    }
+    if data:
+        payload.update(data)
+    return payload
+
+
+def _invalidate_all_unread_counts(session) -> None:
+    invalidate_unread_count()
+
+
+def _enqueue_push(db: Session, tokens: List[str], payload: Dict[str, str]) -> None:
+    if tokens:
+        db.add(NotificationOutbox(payload=payload, tokens=tokens))
+
+
+def send_notification(
     db: Session,
     user_id: int,
     title: str,
     content: str,
     data: Optional[Dict[str, str]] = None
 ) -> Notification:
-    # Simpan ke DB
+    """Simpan notifikasi untuk satu user dan antrekan push-nya (commit di sini)."""
     notification = Notification(
         title=title,
         content=content,
         user_id=user_id
     )
     db.add(notification)
+
+    token = db.scalar(select(User.fcm_token).where(User.id == user_id))
+    _enqueue_push(db, [token] if token else [], _build_fcm_payload(title, content, data))
+
     db.commit()
     db.refresh(notification)
+    invalidate_unread_count(user_id)
+    return notification
+
 
-    # Kirim FCM jika token tersedia
-    user = db.query(User).filter(User.id == user_id).first()
-    if user and user.fcm_token:
-        try:
-            # 1. Buat payload data dasar dengan judul dan isi
-            fcm_data_payload = {
+def enqueue_broadcast(
+    db: Session,
+    title: str,
+    content: str,
+    data: Optional[Dict[str, str]] = None,
+    role: str = "Member"
+) -> int:
+    """
+    Tambahkan notifikasi untuk semua user dengan role tertentu ke session `db`.
+
+    Semua baris Notification disimpan dengan satu bulk INSERT dan token FCM
+    diambil dengan satu query menjadi satu baris outbox. Commit dilakukan
+    pemanggil bersama perubahan datanya. Mengembalikan jumlah penerima.
+    """
+    recipients = db.query(User.id, User.fcm_token).filter(User.role == role).all()
+    if not recipients:
+        return 0
+
+    now = datetime.now()
+    db.execute(
+        insert(Notification),
+        [
+            {
                 "title": title,
-                "body": content
+                "content": content,
+                "user_id": user_id,
+                "is_read": False,
+                "created_at": now,
             }
-            # 2. Jika ada data navigasi (tipe & id), tambahkan ke payload
-            if data:
-                fcm_data_payload.update(data)
-
-            # 3. Buat pesan FCM menggunakan 'data', bukan 'notification'
-            message = messaging.Message(
-                data=fcm_data_payload,
-                token=user.fcm_token,
-                android=messaging.AndroidConfig(
-                    priority="high"  # Meminta prioritas tinggi agar pop-up muncul
-                ),
-                apns=messaging.APNSConfig(
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(content_available=True)
-                    )
-                ),
-            )
-            # --- AKHIR PERUBAHAN ---
-
-            response = messaging.send(message)
-            print(f"[FCM] Notification sent with data: {response}")
-        except Exception as e:
-            print(f"[FCM] Error sending notification: {e}")
-    else:
-        print(f"[FCM] No FCM token available for user {user_id}")
-
-    return notification
\ No newline at end of file
+            for user_id, _ in recipients
+        ],
+    )
+    _enqueue_push(
+        db,
+        [token for _, token in recipients if token],
+        _build_fcm_payload(title, content, data),
+    )
+    # Unread count semua penerima berubah setelah transaksi ini di-commit
+    event.listen(db, "after_commit", _invalidate_all_unread_counts, once=True)
+    return len(recipients)
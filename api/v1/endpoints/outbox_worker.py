@@ -0,0 +1,172 @@
+"""
+Worker pengirim notification_outbox.
+
+Baris outbox diklaim dengan SELECT ... FOR UPDATE SKIP LOCKED sehingga
+beberapa worker (atau beberapa proses API) bisa berjalan bersamaan tanpa
+mengirim push ganda. Klaim dilakukan dengan memajukan next_attempt_at
+sejauh lease: jika worker mati di tengah pengiriman, baris otomatis jatuh
+tempo lagi. Kegagalan sementara dicoba ulang dengan exponential backoff;
+setelah OUTBOX_MAX_ATTEMPTS baris ditandai "dead".
+
+Berjalan di dalam proses API (OUTBOX_WORKER_IN_APP=1, default) atau
+sebagai proses terpisah:
+
+    python -m api.v1.endpoints.outbox_worker
+"""
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, update
+from core.database import AsyncSessionLocal
+from ..models.notification import NotificationOutbox
+from .push_sender import PushResult, create_sender
+
+OUTBOX_WORKER_IN_APP = os.getenv("OUTBOX_WORKER_IN_APP", "1") == "1"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))         # detik
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))           # detik
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+
+logger = logging.getLogger(__name__)
+
+_outbox_stats = {"claimed": 0, "sent": 0, "retried": 0, "dead": 0, "errors": 0}
+
+
+def backoff_delay(attempts: int) -> float:
+    """Jeda sebelum percobaan berikutnya: eksponensial dengan jitter, dibatasi OUTBOX_BACKOFF_MAX."""
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def claim_due(db, limit: int) -> List:
+    """Klaim baris pending yang jatuh tempo (id, payload, tokens, attempts) untuk worker ini."""
+    now = datetime.now()
+    result = await db.execute(
+        select(NotificationOutbox.id, NotificationOutbox.payload,
+               NotificationOutbox.tokens, NotificationOutbox.attempts)
+        .where(NotificationOutbox.status == "pending",
+               NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    entries = result.all()
+    if entries:
+        await db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_([entry.id for entry in entries]))
+            .values(attempts=NotificationOutbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+        )
+    await db.commit()
+    _outbox_stats["claimed"] += len(entries)
+    return entries
+
+
+def _outcome(entry, result: PushResult) -> Dict:
+    attempts = entry.attempts + 1
+    values = {
+        "sent_count": NotificationOutbox.sent_count + result.sent,
+        "last_error": result.error,
+    }
+    if not result.retry_tokens:
+        values["status"] = "sent"
+        _outbox_stats["sent"] += 1
+    elif attempts >= OUTBOX_MAX_ATTEMPTS:
+        values.update(status="dead", tokens=result.retry_tokens)
+        _outbox_stats["dead"] += 1
+    else:
+        values.update(
+            tokens=result.retry_tokens,
+            next_attempt_at=datetime.now() + timedelta(seconds=backoff_delay(attempts)),
+        )
+        _outbox_stats["retried"] += 1
+    return values
+
+
+class OutboxWorker:
+    def __init__(self, sender=None):
+        self.sender = sender or create_sender()
+        self._slots = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        self._stopping = asyncio.Event()
+
+    async def deliver(self, entry) -> None:
+        async with self._slots:
+            try:
+                result = await self.sender.send(list(entry.tokens), entry.payload)
+            except Exception as e:
+                result = PushResult(0, list(entry.tokens), repr(e))
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == entry.id)
+                .values(**_outcome(entry, result))
+            )
+            await db.commit()
+
+    async def run_once(self) -> int:
+        """Klaim dan kirim satu batch. Mengembalikan jumlah baris yang diproses."""
+        async with AsyncSessionLocal() as db:
+            entries = await claim_due(db, OUTBOX_BATCH_SIZE)
+        await asyncio.gather(*(self.deliver(entry) for entry in entries))
+        return len(entries)
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await self.run_once()
+            except Exception:
+                _outbox_stats["errors"] += 1
+                logger.exception("Outbox worker error")
+                processed = 0
+
+            # Batch penuh berarti masih ada antrean, langsung lanjut
+            if processed < OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        await self.sender.close()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+
+_app_worker: Optional[OutboxWorker] = None
+_app_worker_task: Optional[asyncio.Task] = None
+
+
+def start_outbox_worker() -> None:
+    """Jalankan worker sebagai task di event loop API (dipanggil saat startup)."""
+    global _app_worker, _app_worker_task
+    if not OUTBOX_WORKER_IN_APP or _app_worker_task is not None:
+        return
+    _app_worker = OutboxWorker()
+    _app_worker_task = asyncio.create_task(_app_worker.run())
+
+
+async def stop_outbox_worker() -> None:
+    global _app_worker, _app_worker_task
+    if _app_worker_task is None:
+        return
+    _app_worker.stop()
+    await _app_worker_task
+    _app_worker, _app_worker_task = None, None
+
+
+def get_outbox_stats() -> Dict:
+    return {"in_app": OUTBOX_WORKER_IN_APP, **_outbox_stats}
+
+
+if __name__ == "__main__":
+    from core.logging_config import setup_logging
+
+    setup_logging()
+    asyncio.run(OutboxWorker().run())
@@ -0,0 +1,142 @@
+"""
+Pengirim push untuk worker outbox.
+
+Default-nya Firebase Cloud Messaging. Jika FCM_STANDIN_URL diisi, push
+dikirim lewat HTTP ke stand-in lokal (mis. http://localhost:9099/send)
+sehingga worker bisa diuji tanpa kredensial Firebase. Kontrak stand-in:
+
+    POST {"tokens": [...], "data": {...}}
+    2xx  -> terkirim; body opsional {"retry": [token yang perlu dicoba ulang]}
+    429/5xx/timeout -> semua token dicoba ulang
+    4xx lain -> gagal permanen
+"""
+import asyncio
+import os
+from typing import Dict, List, NamedTuple, Optional
+import firebase_admin
+import httpx
+from dotenv import load_dotenv
+from firebase_admin import credentials, exceptions as firebase_exceptions, messaging
+
+load_dotenv()
+
+# Batas maksimum token per panggilan multicast FCM
+FCM_MULTICAST_LIMIT = 500
+FCM_STANDIN_URL = os.getenv("FCM_STANDIN_URL")
+FCM_HTTP_TIMEOUT = float(os.getenv("FCM_HTTP_TIMEOUT", "10"))
+
+# Error per token yang tidak akan berhasil walau dicoba ulang
+PERMANENT_FCM_ERRORS = (
+    messaging.UnregisteredError,
+    messaging.SenderIdMismatchError,
+    firebase_exceptions.InvalidArgumentError,
+)
+
+
+class PushResult(NamedTuple):
+    sent: int
+    retry_tokens: List[str]
+    error: Optional[str] = None
+
+
+def init_firebase():
+    """Inisialisasi Firebase Admin sekali per proses, dari variabel environment."""
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+
+    firebase_cred = {
+        "type": "service_account",
+        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        "private_key": os.getenv("FIREBASE_PRIVATE_KEY", "").replace("\\n", "\n"),
+        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": "https://www.googleapis.com/robot/v1/metadata/x509/firebase-adminsdk-fbsvc%40opn-2da62.iam.gserviceaccount.com",
+    }
+    return firebase_admin.initialize_app(credentials.Certificate(firebase_cred))
+
+
+def _android_config() -> messaging.AndroidConfig:
+    # Meminta prioritas tinggi agar pop-up muncul
+    return messaging.AndroidConfig(priority="high")
+
+
+def _apns_config() -> messaging.APNSConfig:
+    return messaging.APNSConfig(
+        payload=messaging.APNSPayload(
+            aps=messaging.Aps(content_available=True)
+        )
+    )
+
+
+class FirebaseSender:
+    name = "firebase"
+
+    def __init__(self):
+        init_firebase()
+
+    async def send(self, tokens: List[str], payload: Dict[str, str]) -> PushResult:
+        """Multicast per 500 token; token dengan error sementara dikembalikan untuk dicoba ulang."""
+        sent, retry_tokens, error = 0, [], None
+        for start in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+            chunk = tokens[start:start + FCM_MULTICAST_LIMIT]
+            message = messaging.MulticastMessage(
+                data=payload,
+                tokens=chunk,
+                android=_android_config(),
+                apns=_apns_config(),
+            )
+            try:
+                # SDK Firebase blocking, jalankan di thread agar event loop tetap bebas
+                batch = await asyncio.to_thread(messaging.send_each_for_multicast, message)
+            except Exception as e:
+                retry_tokens.extend(chunk)
+                error = repr(e)
+                continue
+
+            for token, response in zip(chunk, batch.responses):
+                if response.success:
+                    sent += 1
+                elif not isinstance(response.exception, PERMANENT_FCM_ERRORS):
+                    retry_tokens.append(token)
+                    error = repr(response.exception)
+        return PushResult(sent, retry_tokens, error)
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpStandInSender:
+    name = "http"
+
+    def __init__(self, url: str):
+        self._url = url
+        self._client = httpx.AsyncClient(timeout=FCM_HTTP_TIMEOUT)
+
+    async def send(self, tokens: List[str], payload: Dict[str, str]) -> PushResult:
+        try:
+            response = await self._client.post(self._url, json={"tokens": tokens, "data": payload})
+        except httpx.HTTPError as e:
+            return PushResult(0, list(tokens), repr(e))
+
+        if response.status_code == 429 or response.status_code >= 500:
+            return PushResult(0, list(tokens), f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            return PushResult(0, [], f"HTTP {response.status_code}")
+
+        try:
+            retry_tokens = list(response.json().get("retry", []))
+        except ValueError:
+            retry_tokens = []
+        return PushResult(len(tokens) - len(retry_tokens), retry_tokens,
+                          "partial failure" if retry_tokens else None)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_sender():
+    return HttpStandInSender(FCM_STANDIN_URL) if FCM_STANDIN_URL else FirebaseSender()
@@ -0,0 +1,61 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from core.cache import get_response_cache_stats
+from core.database import admin_required, get_db
+from core.logging_config import get_logging_stats
+from core.metrics import METRICS_TOKEN, render_metrics
+from core.passwords import get_password_queue_stats
+from core.rate_limit import get_login_guard_stats
+from core.security import authenticate_token, oauth2_scheme_optional, verify_token, get_principal_cache_stats
+from core.utils.file_handler import get_image_queue_stats
+from .outbox_worker import get_outbox_stats
+from ..models.user import User
+
+router = APIRouter()
+# /metrics dipasang di root (tanpa prefix) agar bisa langsung di-scrape Prometheus
+metrics_router = APIRouter()
+
+def _component_stats() -> dict:
+    return {
+        "principal_cache": get_principal_cache_stats(),
+        "response_cache": get_response_cache_stats(),
+        "image_queue": get_image_queue_stats(),
+        "password_queue": get_password_queue_stats(),
+        "login_guard": get_login_guard_stats(),
+        "push_outbox": get_outbox_stats(),
+        "logging": get_logging_stats()
+    }
+
+@router.get("/cache-stats")
+@admin_required()
+async def get_cache_stats(current_user: User = Depends(verify_token)):
+    """Statistik cache dan antrean internal (khusus Admin)."""
+    return _component_stats()
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    db: Session = Depends(get_db)
+):
+    """
+    Metrik format Prometheus (berisi statistik internal yang sama dengan
+    /cache-stats). Wajib `Authorization: Bearer <METRICS_TOKEN>` untuk scraper,
+    atau access token Admin; tanpa METRICS_TOKEN hanya Admin yang bisa akses.
+    """
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unauthorized: Invalid or missing token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not (METRICS_TOKEN and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())):
+        current_user = await run_in_threadpool(authenticate_token, token, db)
+        if current_user.role != "Admin":
+            raise HTTPException(status_code=403, detail="Admin access required")
+    return PlainTextResponse(render_metrics(_component_stats()),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
@@ -4,6 +4,7 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
 import os
+from core.cache import response_cache
 from core.security import verify_token
 from core.database import get_db, admin_required
 from core.utils.file_handler import FileHandler
@@ -15,6 +16,9 @@ from ..models.finance import Finance
 router = APIRouter()
 file_handler = FileHandler()
 
+# Kategori yang fotonya ditampilkan di list view mobile dan perlu varian ukuran
+VARIANT_CATEGORIES = ("news", "events")
+
 async def save_multiple_images(entity_id: int, files: List[UploadFile], entity_type: str, db: Session):
     """Helper function untuk menyimpan multiple gambar."""
     uploaded_urls = []
@@ -28,7 +32,10 @@ async def save_multiple_images(entity_id: int, files: List[UploadFile], entity_t
         file_extension = os.path.splitext(file.filename)[1]
         new_filename = f"{timestamp}_{idx}{file_extension}"
         
-        file_url = await file_handler.save_file(file, f"{entity_type}/{today_date}", new_filename)
+        file_url = await file_handler.save_file(
+            file, f"{entity_type}/{today_date}", new_filename,
+            variants=entity_type in VARIANT_CATEGORIES
+        )
         file_url = file_url.replace("\\", "/")
 
         if entity_type == "news":
@@ -46,6 +53,8 @@ async def save_multiple_images(entity_id: int, files: List[UploadFile], entity_t
         uploaded_urls.append(file_url)
 
     db.commit()
+    # Foto tampil di list news/events yang di-cache
+    await response_cache.evict(entity_type)
     return uploaded_urls
 
 async def replace_file(
@@ -68,7 +77,10 @@ async def replace_file(
 
     # Save file
     today = datetime.now().strftime("%Y-%m-%d")
-    file_url = await file_handler.save_file(file, f"{category}/{today}", filename)
+    file_url = await file_handler.save_file(
+        file, f"{category}/{today}", filename,
+        variants=category in VARIANT_CATEGORIES
+    )
     file_url = file_url.replace("\\", "/")
 
     # Update field di DB model
@@ -132,7 +144,7 @@ async def upload_or_replace_news_photo(
 
     # 6. Simpan file baru
     today = datetime.now().strftime("%Y-%m-%d")
-    file_url = await file_handler.save_file(file, f"news/{today}", filename)
+    file_url = await file_handler.save_file(file, f"news/{today}", filename, variants=True)
     file_url = file_url.replace("\\", "/")
 
     if existing_photo:
@@ -146,6 +158,7 @@ async def upload_or_replace_news_photo(
         db.add(new_photo)
 
     db.commit()
+    await response_cache.evict("news")
 
     return {
         "photo_url": file_url,
@@ -175,6 +188,7 @@ async def edit_news_photo(
         db_field_name="photo_url",
         db=db
     )
+    await response_cache.evict("news")
 
     return {"updated_file": file_url}
 
@@ -197,6 +211,7 @@ async def delete_news_photo(
     # Hapus dari database
     db.delete(photo)
     db.commit()
+    await response_cache.evict("news")
     return {"message": "Photo deleted successfully"}
 
 @router.post("/events/{event_id}/photos", tags=["Uploads - Events"])
@@ -236,6 +251,7 @@ async def edit_event_photo(
         db_field_name="photo_url",
         db=db
     )
+    await response_cache.evict("events")
 
     return {"updated_file": file_url}
 
@@ -255,6 +271,7 @@ async def delete_event_photo(
     
     db.delete(photo)
     db.commit()
+    await response_cache.evict("events")
     return {"message": "Photo deleted successfully"}
 
 @router.post("/finances/{finance_id}/document", tags=["Uploads - Finance"])
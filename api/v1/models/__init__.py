@@ -2,5 +2,6 @@ from .user import Member
 from .feedback import Feedback
 from .events import Event
 from .news import News
-from .finance import Finance
-from .notification import Notification
+from .finance import Finance, FinanceMonthlySummary
+from .notification import Notification, NotificationOutbox
+from .auth import RefreshToken, TokenVersion
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from datetime import datetime
+from core.database import Base
+
+class RefreshToken(Base):
+    """
+    Refresh token berumur panjang. Yang disimpan hanya hash SHA-256-nya;
+    setiap pemakaian merotasi token (baris lama di-revoke, diganti baris baru
+    dengan family_id yang sama) sehingga pemakaian ulang token lama bisa
+    dideteksi dan seluruh family dicabut.
+    """
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user", "user_id", "revoked_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    family_id = Column(String(32), index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class TokenVersion(Base):
+    """
+    Versi token per user (klaim `ver` di access token). Menaikkan versi
+    membatalkan semua access token user tersebut yang masih berlaku.
+    Tidak ada baris berarti versi 0.
+    """
+    __tablename__ = "token_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
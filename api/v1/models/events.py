@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Time, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Time, Text, ForeignKey, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
@@ -9,6 +9,10 @@ from api.v1.models.user import Member
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # 🔍 pencarian kata kunci (MATCH ... AGAINST), urutan kolom harus sama dengan query
+        Index("ft_events_search", "title", "description", "location", mysql_prefix="FULLTEXT"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)         # 🔍 sering dicari => index
@@ -39,6 +43,10 @@ class EventPhoto(Base):
 
 class Attendance(Base):
     __tablename__ = "attendances"
+    __table_args__ = (
+        # Satu baris kehadiran per member per event (dipakai upsert massal)
+        UniqueConstraint("event_id", "member_id", name="uq_attendance_event_member"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"))
@@ -51,11 +59,14 @@ class Attendance(Base):
     event = relationship("Event", back_populates="attendances")
     member = relationship("Member", back_populates="attendances")
     
-    # Auto-load full_name dari join Member
+    # full_name dari Member, deferred agar SELECT Attendance biasa tidak menjalankan
+    # subquery berkorelasi per baris. Jalur baca memakai projection join
+    # (lihat fetch_attendance_rows di endpoints/events.py).
     full_name = column_property(
         select(Member.full_name)
         .where(Member.id == member_id)
         .correlate_except(Member)
-        .scalar_subquery()
+        .scalar_subquery(),
+        deferred=True
     )
     
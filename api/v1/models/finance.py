@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, DECIMAL
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, Enum, DECIMAL, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
 
 class Finance(Base):
     __tablename__ = "finances"
+    __table_args__ = (
+        # urutan buku kas & keyset pagination (date, id)
+        Index("ix_finances_date_id", "date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(DECIMAL(12, 2), nullable=False)
@@ -17,4 +21,13 @@ class Finance(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
- 
\ No newline at end of file
+ 
+
+class FinanceMonthlySummary(Base):
+    """Total per bulan & kategori, dijaga bersamaan dengan perubahan transaksi (finance_service)."""
+    __tablename__ = "finance_monthly_summary"
+
+    month = Column(Date, primary_key=True, comment="Tanggal 1 bulan tersebut")
+    category = Column(Enum("Pemasukan", "Pengeluaran"), primary_key=True)
+    total = Column(DECIMAL(14, 2), nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Text, Boolean
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from core.database import Base
 from datetime import datetime
 
 class News(Base):
     __tablename__ = "news"
+    __table_args__ = (
+        # pencarian kata kunci (MATCH ... AGAINST)
+        Index("ft_news_search", "title", "description", mysql_prefix="FULLTEXT"),
+        # urutan & keyset pagination (date, id)
+        Index("ix_news_date_id", "date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index, Enum, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
 
 class Notification(Base):
     __tablename__ = "notification"
+    __table_args__ = (
+        # Inbox per user: urutan (created_at, id) untuk keyset pagination
+        Index("ix_notification_user_created", "user_id", "created_at", "id"),
+        # Hitung notifikasi belum dibaca
+        Index("ix_notification_user_read", "user_id", "is_read"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255))
@@ -16,3 +22,26 @@ class Notification(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
 
     user = relationship("User", back_populates="notifications")
+
+
+class NotificationOutbox(Base):
+    """
+    Antrean push FCM yang ditulis dalam transaksi yang sama dengan perubahan
+    data, lalu dikirim oleh worker outbox (api/v1/endpoints/outbox_worker.py).
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Worker mengambil baris pending yang sudah jatuh tempo
+        Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    payload = Column(JSON, nullable=False)              # data FCM (title, body, type, id)
+    tokens = Column(JSON, nullable=False)               # token tujuan yang belum terkirim
+    status = Column(Enum("pending", "sent", "dead"), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
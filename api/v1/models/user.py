@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
@@ -21,6 +21,10 @@ class User(Base):
 
 class Member(Base):
     __tablename__ = "members"
+    __table_args__ = (
+        # pencarian nama (MATCH ... AGAINST)
+        Index("ft_members_full_name", "full_name", mysql_prefix="FULLTEXT"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
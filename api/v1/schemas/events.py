@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field, field_serializer
 from datetime import datetime, time
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
+from core.utils.file_handler import image_variant_urls
+from core.utils.signed_url import sign_url
 
 class EventBase(BaseModel):
     title: str
@@ -27,6 +29,19 @@ class EventPhotoResponse(BaseModel):
     photo_url: str
     uploaded_at: datetime
 
+    @field_serializer("photo_url")
+    def serialize_photo_url(self, photo_url: str) -> str:
+        return sign_url(photo_url)
+
+    @computed_field
+    @property
+    def variants(self) -> Dict[str, Dict[str, str]]:
+        """URL varian (bertanda tangan) per lebar (px) dan format, mis. variants["480"]["webp"]."""
+        return {
+            width: {fmt: sign_url(url) for fmt, url in formats.items()}
+            for width, formats in image_variant_urls(self.photo_url).items()
+        }
+
     class Config:
         from_attributes = True
 
@@ -85,8 +100,9 @@ class EventSearch(BaseModel):
 class PaginationMeta(BaseModel):
         page: int
         limit: int
-        total: int
-        total_pages: int
+        total: Optional[int] = None
+        total_pages: Optional[int] = None
+        next_cursor: Optional[str] = None
 
 class PaginatedEventResponse(BaseModel):
     data: List[EventResponse]
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_serializer
 from datetime import datetime
 from typing import Optional
 from decimal import Decimal
 from typing import List
+from core.utils.signed_url import sign_url
 
 class FinanceBase(BaseModel):
     amount: Decimal
@@ -30,6 +31,10 @@ class FinanceResponse(FinanceBase):
     created_at: datetime
     updated_at: datetime
 
+    @field_serializer("document_url")
+    def serialize_document_url(self, document_url: Optional[str]) -> Optional[str]:
+        return sign_url(document_url)
+
     class Config:
         from_attributes = True
         
@@ -41,6 +46,10 @@ class FinanceResponseDetail(FinanceBase):
     created_at: datetime
     updated_at: datetime
 
+    @field_serializer("document_url")
+    def serialize_document_url(self, document_url: Optional[str]) -> Optional[str]:
+        return sign_url(document_url)
+
     class Config:
         from_attributes = True
 
@@ -50,4 +59,9 @@ class FinanceHistoryResponse(BaseModel):
     
 class PaginatedFinanceResponse(BaseModel):
     data: List[FinanceResponse]
-    meta: dict
\ No newline at end of file
+    meta: dict
+
+class FinanceSummaryResponse(BaseModel):
+    total_income: Decimal
+    total_expense: Decimal
+    balance: Decimal
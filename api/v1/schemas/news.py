@@ -1,12 +1,27 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field, field_serializer
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
+from core.utils.file_handler import image_variant_urls
+from core.utils.signed_url import sign_url
 
 class NewsPhotoResponse(BaseModel):
     id: int
     photo_url: str
     uploaded_at: datetime
 
+    @field_serializer("photo_url")
+    def serialize_photo_url(self, photo_url: str) -> str:
+        return sign_url(photo_url)
+
+    @computed_field
+    @property
+    def variants(self) -> Dict[str, Dict[str, str]]:
+        """URL varian (bertanda tangan) per lebar (px) dan format, mis. variants["480"]["webp"]."""
+        return {
+            width: {fmt: sign_url(url) for fmt, url in formats.items()}
+            for width, formats in image_variant_urls(self.photo_url).items()
+        }
+
 class NewsBase(BaseModel):
     title: str
     description: str
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 # Base schema (bisa dipakai saat membuat notifikasi, kalau diperlukan)
 class NotificationBase(BaseModel):
@@ -19,5 +19,11 @@ class NotificationResponse(NotificationBase):
     class Config:
         from_attributes = True
 
+class NotificationMarkRead(BaseModel):
+    ids: Optional[List[int]] = None  # Kosong = tandai semua notifikasi terbaca
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
 class FCMTokenPayload(BaseModel):
     token: str
\ No newline at end of file
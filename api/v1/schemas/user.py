@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, model_validator
+from pydantic import BaseModel, EmailStr, field_serializer, model_validator
 from datetime import date, datetime
 from typing import Literal, Optional, ForwardRef
+from core.utils.signed_url import sign_url
 
 
 class UserBase(BaseModel):
@@ -17,6 +18,9 @@ class UserCreateWithRole(BaseModel):
 class UserLogin(UserBase):
     password: str
 
+class TokenRefreshRequest(BaseModel):
+    refresh_token: str
+
 class MemberCreate(BaseModel):
     full_name: str
     email: EmailStr
@@ -55,6 +59,10 @@ class MemberResponseBase(BaseModel):
     class Config:
         from_attributes = True
 
+    @field_serializer("photo_url")
+    def serialize_photo_url(self, photo_url: Optional[str]) -> Optional[str]:
+        return sign_url(photo_url)
+
     @model_validator(mode='before')
     def calculate_age(cls, values):
         if 'birth_date' in values:
@@ -0,0 +1,199 @@
+"""
+Cache respons untuk endpoint GET yang jauh lebih sering dibaca daripada ditulis.
+
+Kunci cache = path route + query params (diurutkan). Yang disimpan adalah
+body JSON yang sudah diserialisasi, jadi cache hit tidak menyentuh MySQL
+maupun Pydantic. Setiap entri diberi tag (mis. "news"), dan handler
+create/update/delete menghapus semua entri dengan tag terkait.
+
+Backend default adalah LRU + TTL di memori proses. Jika RESPONSE_CACHE_URL
+diisi (mis. redis://localhost:6379/0) dan paket `redis` terpasang, cache
+dibagi lewat Redis sehingga eviction berlaku untuk semua worker. Dengan
+backend memori dan beberapa worker, data basi paling lama RESPONSE_CACHE_TTL.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Set
+from urllib.parse import urlencode
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+try:
+    import redis.asyncio as redis_asyncio
+    from redis.exceptions import RedisError
+except ImportError:  # redis opsional
+    redis_asyncio = None
+    RedisError = Exception
+
+load_dotenv()
+
+# TTL harus jauh di bawah MEDIA_URL_TTL karena respons berisi URL media bertanda tangan
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "512"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+RESPONSE_CACHE_PREFIX = os.getenv("RESPONSE_CACHE_PREFIX", "respcache:")
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+
+class MemoryCacheBackend:
+    name = "memory"
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            return self._entries.get(key)
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            for tag in tags:
+                keys = self._tags.setdefault(tag, set())
+                keys.add(key)
+                if len(keys) > self._entries.maxsize:
+                    # Buang kunci yang sudah kedaluwarsa/tergusur dari indeks tag
+                    keys.intersection_update(self._entries.keys())
+
+    async def evict(self, tags: Iterable[str]) -> int:
+        evicted = 0
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if self._entries.pop(key, None) is not None:
+                        evicted += 1
+        return evicted
+
+    def size(self) -> Optional[int]:
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCacheBackend:
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int, prefix: str):
+        self._client = redis_asyncio.from_url(url)
+        self._ttl = ttl
+        self._prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self._prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raw = await self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        headers_raw, _, body = raw.partition(b"\n")
+        return CachedResponse(body, json.loads(headers_raw))
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str]) -> None:
+        raw = json.dumps(value.headers).encode() + b"\n" + value.body
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.set(self._prefix + key, raw, ex=self._ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), self._prefix + key)
+                pipe.expire(self._tag_key(tag), self._ttl * 2)
+            await pipe.execute()
+
+    async def evict(self, tags: Iterable[str]) -> int:
+        evicted = 0
+        for tag in tags:
+            keys = await self._client.smembers(self._tag_key(tag))
+            if keys:
+                evicted += await self._client.delete(*keys)
+            await self._client.delete(self._tag_key(tag))
+        return evicted
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._adapters: Dict[Any, TypeAdapter] = {}
+
+    @staticmethod
+    def key_for(request: Request) -> str:
+        params = sorted(request.query_params.multi_items())
+        return f"{request.url.path}?{urlencode(params)}"
+
+    def render(self, response_model, data) -> bytes:
+        """Serialisasi seperti response_model FastAPI (from_attributes, by_alias)."""
+        adapter = self._adapters.get(response_model)
+        if adapter is None:
+            adapter = self._adapters[response_model] = TypeAdapter(response_model)
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True), by_alias=True)
+
+    async def get(self, request: Request) -> Optional[Response]:
+        """Respons dari cache, atau None (miss) agar handler menghitungnya."""
+        try:
+            cached = await self.backend.get(self.key_for(request))
+        except RedisError:
+            self._stats["errors"] += 1
+            cached = None
+
+        if cached is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return Response(content=cached.body, media_type="application/json",
+                        headers={**cached.headers, "X-Cache": "HIT"})
+
+    async def store(
+        self,
+        request: Request,
+        response_model,
+        data,
+        tags: Iterable[str],
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Serialisasi `data`, simpan dengan tag, lalu kembalikan sebagai Response."""
+        cached = CachedResponse(self.render(response_model, data), dict(headers or {}))
+        try:
+            await self.backend.set(self.key_for(request), cached, tuple(tags))
+            self._stats["stores"] += 1
+        except RedisError:
+            self._stats["errors"] += 1
+        return Response(content=cached.body, media_type="application/json",
+                        headers={**cached.headers, "X-Cache": "MISS"})
+
+    async def evict(self, *tags: str) -> None:
+        """Hapus semua entri dengan tag tersebut (dipanggil setelah commit)."""
+        try:
+            self._stats["evictions"] += await self.backend.evict(tags)
+        except RedisError:
+            self._stats["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "backend": self.backend.name,
+            "size": self.backend.size(),
+            **self._stats,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+def _create_backend():
+    if RESPONSE_CACHE_URL and redis_asyncio is not None:
+        return RedisCacheBackend(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PREFIX)
+    return MemoryCacheBackend(RESPONSE_CACHE_MAXSIZE, RESPONSE_CACHE_TTL)
+
+
+response_cache = ResponseCache(_create_backend())
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    return response_cache.stats()
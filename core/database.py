@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from functools import wraps
@@ -23,6 +25,30 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def _async_database_url() -> str:
+    """URL untuk engine async: pakai SQLALCHEMY_ASYNC_DATABASE_URL jika ada,
+    jika tidak driver MySQL dari SQLALCHEMY_DATABASE_URL diganti ke asyncmy."""
+    if async_url := os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL"):
+        return async_url
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if url.get_backend_name() == "mysql":
+        url = url.set(drivername="mysql+asyncmy")
+    return url.render_as_string(hide_password=False)
+
+async_engine = create_async_engine(
+    _async_database_url(),
+    pool_size=20,
+    max_overflow=50,
+    pool_timeout=30
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -30,6 +56,12 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency AsyncSession untuk endpoint baca agar query tidak memblokir event loop.
+    Relasi harus di-eager-load (selectinload) karena lazy-load tidak tersedia di AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def admin_required():
     """
     Decorator yang memeriksa apakah user memiliki role 'Admin'.
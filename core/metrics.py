@@ -0,0 +1,295 @@
+"""
+Instrumentasi request: latensi per route, jumlah & durasi statement SQL per
+request, byte yang dikirim, plus log request lambat beserta SQL-nya.
+
+- MetricsMiddleware (ASGI murni, tidak mem-buffer body) dipasang paling luar
+  di main.py sehingga juga mengukur StreamingResponse sampai byte terakhir.
+- instrument_engine() memasang event SQLAlchemy pada engine sync dan async;
+  statistik per request diteruskan lewat ContextVar (ikut ke threadpool
+  endpoint sync maupun greenlet AsyncSession).
+- render_metrics() menghasilkan format teks Prometheus untuk GET /metrics.
+
+Label route memakai template path (/api/v1/news/{news_id}), bukan URL asli,
+agar jumlah seri tetap kecil. Request yang tidak cocok route mana pun
+digabung ke "<unmatched>".
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+load_dotenv()
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+SLOW_REQUEST_STATEMENT_CHARS = int(os.getenv("SLOW_REQUEST_STATEMENT_CHARS", "500"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "<unmatched>"
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "sql")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.sql: List[Tuple[float, str]] = []
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # slot terakhir = +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_progress = 0
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.statements: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = {}
+        self.bytes_sent: Dict[Tuple[str, str], int] = {}
+        self.slow_requests: Dict[Tuple[str, str], int] = {}
+
+    def record(self, method: str, route: str, status_code: int, seconds: float,
+               stats: RequestStats, bytes_sent: int) -> None:
+        key = (method, route)
+        with self._lock:
+            request_key = (method, route, str(status_code))
+            self.requests[request_key] = self.requests.get(request_key, 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(stats.statements)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.db_seconds
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + bytes_sent
+            if seconds >= SLOW_REQUEST_SECONDS:
+                self.slow_requests[key] = self.slow_requests.get(key, 0) + 1
+
+
+registry = MetricsRegistry()
+
+
+# ======================
+# 🗄️ SQLAlchemy hooks
+# ======================
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_request.get() is not None:
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    if stats is None:
+        return
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if len(stats.sql) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.sql.append((elapsed, statement[:SLOW_REQUEST_STATEMENT_CHARS]))
+
+
+def _handle_error(exception_context):
+    # Statement gagal tidak memanggil after_cursor_execute: buang waktu mulainya
+    conn = exception_context.connection
+    if conn is not None:
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine) -> None:
+    """Pasang hook pada Engine sync atau AsyncEngine (lewat sync_engine-nya)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ======================
+# ⏱️ Middleware
+# ======================
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[object, str] = {}
+
+    def _route_label(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None and hasattr(route, "path"):
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if not self._route_paths:
+            app = scope.get("app")
+            for candidate in getattr(app, "routes", []):
+                if hasattr(candidate, "endpoint") and hasattr(candidate, "path"):
+                    self._route_paths.setdefault(candidate.endpoint, candidate.path)
+        return self._route_paths.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+        bytes_sent = 0
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, bytes_sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_sent += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_progress += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_progress -= 1
+            _current_request.reset(token)
+            elapsed = time.perf_counter() - start
+            method = scope.get("method", "GET")
+            route = self._route_label(scope)
+            registry.record(method, route, status_code, elapsed, stats, bytes_sent)
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                _log_slow_request(method, scope.get("path", ""), route, status_code, elapsed, stats)
+
+
+def _log_slow_request(method: str, path: str, route: str, status_code: int,
+                      elapsed: float, stats: RequestStats) -> None:
+    slowest = sorted(stats.sql, key=lambda item: item[0], reverse=True)
+    logger.warning(
+        "Slow request %s %s (%s) -> %s in %.3fs, %d statements / %.3fs DB\n%s",
+        method, path, route, status_code, elapsed, stats.statements, stats.db_seconds,
+        "\n".join(f"  {seconds * 1000:8.1f} ms  {sql}" for seconds, sql in slowest),
+        extra={
+            "method": method, "path": path, "route": route, "status": status_code,
+            "duration": round(elapsed, 4), "db_statements": stats.statements,
+            "db_seconds": round(stats.db_seconds, 4),
+        },
+    )
+
+
+# ======================
+# 📈 Prometheus
+# ======================
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histograms: Dict[Tuple[str, str], Histogram]) -> List[str]:
+    lines = []
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.total}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+    return lines
+
+
+def _flatten_stats(prefix: str, stats: Dict) -> Iterable[Tuple[str, float]]:
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten_stats(f"{prefix}{key}_", value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def render_metrics(component_stats: Optional[Dict[str, Dict]] = None) -> str:
+    """Semua metrik dalam format teks Prometheus (text/plain; version=0.0.4)."""
+    with registry._lock:
+        requests = dict(registry.requests)
+        latency = {key: _copy_histogram(value) for key, value in registry.latency.items()}
+        statements = {key: _copy_histogram(value) for key, value in registry.statements.items()}
+        db_seconds = dict(registry.db_seconds)
+        bytes_sent = dict(registry.bytes_sent)
+        slow_requests = dict(registry.slow_requests)
+
+    lines = [
+        "# HELP http_requests_in_progress Requests currently being served.",
+        "# TYPE http_requests_in_progress gauge",
+        f"http_requests_in_progress {registry.in_progress}",
+        "# HELP http_requests_total Requests by route and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    lines += [f"http_requests_total{_labels(method=m, route=r, status=s)} {count}"
+              for (m, r, s), count in sorted(requests.items())]
+
+    lines += ["# HELP http_request_duration_seconds Request latency by route.",
+              "# TYPE http_request_duration_seconds histogram"]
+    lines += _histogram_lines("http_request_duration_seconds", latency)
+
+    lines += ["# HELP http_request_db_statements SQL statements executed per request.",
+              "# TYPE http_request_db_statements histogram"]
+    lines += _histogram_lines("http_request_db_statements", statements)
+
+    lines += ["# HELP http_request_db_seconds_total Time spent in SQL statements by route.",
+              "# TYPE http_request_db_seconds_total counter"]
+    lines += [f"http_request_db_seconds_total{_labels(method=m, route=r)} {value}"
+              for (m, r), value in sorted(db_seconds.items())]
+
+    lines += ["# HELP http_response_bytes_total Response body bytes sent by route.",
+              "# TYPE http_response_bytes_total counter"]
+    lines += [f"http_response_bytes_total{_labels(method=m, route=r)} {value}"
+              for (m, r), value in sorted(bytes_sent.items())]
+
+    lines += [f"# HELP http_slow_requests_total Requests slower than {SLOW_REQUEST_SECONDS}s by route.",
+              "# TYPE http_slow_requests_total counter"]
+    lines += [f"http_slow_requests_total{_labels(method=m, route=r)} {value}"
+              for (m, r), value in sorted(slow_requests.items())]
+
+    if component_stats:
+        # Statistik cache/antrean internal (sama dengan /system/cache-stats)
+        lines += ["# HELP app_component_stat Internal cache and queue statistics.",
+                  "# TYPE app_component_stat gauge"]
+        for component, stats in component_stats.items():
+            for stat, value in _flatten_stats("", stats or {}):
+                lines.append(f"app_component_stat{_labels(component=component, stat=stat)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _copy_histogram(histogram: Histogram) -> Histogram:
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.total = histogram.total
+    copy.count = histogram.count
+    return copy
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt memakan ~250 ms CPU per hash/verify. Dijalankan di thread pool terpisah
+# (bcrypt melepas GIL) dengan batas antrean, agar lonjakan login tidak
+# membekukan event loop dan tidak menumpuk tanpa batas.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))          # job yang boleh menunggu
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "10"))    # detik
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=BCRYPT_ROUNDS)
+
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+_password_queue_stats = {"waiting": 0, "in_flight": 0, "completed": 0, "rejected": 0, "rehashed": 0}
+
+
+def _needs_rehash(hashed_password: str) -> bool:
+    """True jika hash memakai skema usang atau cost bcrypt berbeda dari BCRYPT_ROUNDS."""
+    if pwd_context.needs_update(hashed_password):
+        return True
+    try:
+        # Format bcrypt: $2b$<rounds>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def _verify_and_update(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    # Nilai yang bukan hash yang dikenal (mis. hash rusak/terpotong) tidak pernah
+    # dibandingkan langsung dengan input; password tanpa hash dimigrasi lewat
+    # `python -m core.passwords --migrate-plaintext`
+    if not hashed_password or pwd_context.identify(hashed_password) is None:
+        return False, None
+
+    try:
+        if not pwd_context.verify(plain_password, hashed_password):
+            return False, None
+    except ValueError:
+        # Hash rusak/terpotong dengan prefix yang dikenal: tolak, bukan 500
+        return False, None
+    if _needs_rehash(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+
+async def _run_password_job(func, *args):
+    """
+    Jalankan hash/verify di thread pool: maksimal PASSWORD_HASH_WORKERS job
+    berjalan, PASSWORD_HASH_QUEUE_LIMIT menunggu, selebihnya (atau yang
+    menunggu lebih dari PASSWORD_HASH_QUEUE_TIMEOUT) ditolak 503.
+    """
+    if _password_queue_stats["waiting"] >= PASSWORD_HASH_QUEUE_LIMIT:
+        _password_queue_stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Server is busy, please try again later",
+                            headers={"Retry-After": "1"})
+
+    _password_queue_stats["waiting"] += 1
+    try:
+        await asyncio.wait_for(_password_slots.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _password_queue_stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Server is busy, please try again later",
+                            headers={"Retry-After": "1"})
+    finally:
+        _password_queue_stats["waiting"] -= 1
+
+    _password_queue_stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_pool, func, *args)
+    finally:
+        _password_queue_stats["in_flight"] -= 1
+        _password_queue_stats["completed"] += 1
+        _password_slots.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run_password_job(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Verifikasi password. Mengembalikan (valid, hash_baru); hash_baru diisi jika
+    hash tersimpan perlu di-upgrade (cost berubah atau belum di-hash) dan harus
+    disimpan pemanggil.
+    """
+    valid, new_hash = await _run_password_job(_verify_and_update, plain_password, hashed_password)
+    if new_hash:
+        _password_queue_stats["rehashed"] += 1
+    return valid, new_hash
+
+
+def get_password_queue_stats() -> dict:
+    return {
+        **_password_queue_stats,
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+    }
+
+
+# Nilai yang tampak seperti hash skema lain ($...$, hex MD5/SHA1/SHA256) tidak
+# dimigrasi: menjadikannya password berarti hash bocor bisa dipakai login
+_HASH_LIKE = re.compile(r"^(\$.*|[0-9a-fA-F]{32}|[0-9a-fA-F]{40}|[0-9a-fA-F]{64})$")
+
+
+def migrate_plaintext_passwords(db, dry_run: bool = False) -> dict:
+    """
+    Migrasi sekali jalan untuk akun lama yang password-nya tersimpan tanpa hash
+    (dibuat lewat create_user sebelum password di-hash): hash ke bcrypt.
+    Nilai yang menyerupai hash lain dilewati dan harus di-reset manual.
+    """
+    from api.v1.models.user import User
+
+    migrated, skipped = [], []
+    for user in db.query(User).filter(User.password.isnot(None)):
+        if pwd_context.identify(user.password) is not None:
+            continue
+        if _HASH_LIKE.match(user.password):
+            skipped.append(user.id)
+            continue
+        migrated.append(user.id)
+        if not dry_run:
+            user.password = pwd_context.hash(user.password)
+    if not dry_run:
+        db.commit()
+    return {"migrated": migrated, "skipped": skipped}
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    from core.database import SessionLocal
+    from core.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Migrasi password lama tanpa hash ke bcrypt")
+    parser.add_argument("--migrate-plaintext", action="store_true", help="Hash password yang tersimpan tanpa hash")
+    parser.add_argument("--check", action="store_true", help="Hanya tampilkan akun yang terdampak")
+    args = parser.parse_args()
+    setup_logging()
+    logger = logging.getLogger("core.passwords")
+
+    if not args.migrate_plaintext:
+        parser.error("gunakan --migrate-plaintext")
+    session = SessionLocal()
+    try:
+        result = migrate_plaintext_passwords(session, dry_run=args.check)
+        logger.info("Password dimigrasi: %s user %s", len(result["migrated"]), result["migrated"])
+        if result["skipped"]:
+            logger.warning("Dilewati (bukan bcrypt, menyerupai hash lain; reset manual): %s", result["skipped"])
+    finally:
+        session.close()
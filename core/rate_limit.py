@@ -0,0 +1,242 @@
+"""
+Pembatas percobaan login (sliding window) per IP dan per username.
+
+Semua pemeriksaan dilakukan sebelum query database maupun bcrypt, sehingga
+serangan brute-force / credential stuffing tidak menghabiskan CPU:
+
+- per IP: maksimal LOGIN_IP_LIMIT percobaan dalam LOGIN_IP_WINDOW detik;
+- per username: setelah LOGIN_USER_FAILURE_LIMIT kegagalan dalam
+  LOGIN_USER_WINDOW detik, username dikunci selama LOGIN_LOCKOUT_SECONDS;
+- kombinasi username + password yang baru saja gagal (disimpan sebagai HMAC,
+  bukan password-nya) langsung ditolak tanpa bcrypt.
+
+Backend default di memori proses. Jika RATE_LIMIT_URL diisi (mis.
+redis://localhost:6379/1) dan paket `redis` terpasang, hitungan dibagi
+antar worker lewat Redis.
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+try:
+    import redis.asyncio as redis_asyncio
+    from redis.exceptions import RedisError
+except ImportError:  # redis opsional
+    redis_asyncio = None
+    RedisError = Exception
+
+load_dotenv()
+
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "30"))
+LOGIN_IP_WINDOW = int(os.getenv("LOGIN_IP_WINDOW", "60"))                     # detik
+LOGIN_USER_FAILURE_LIMIT = int(os.getenv("LOGIN_USER_FAILURE_LIMIT", "5"))
+LOGIN_USER_WINDOW = int(os.getenv("LOGIN_USER_WINDOW", "900"))                # detik
+LOGIN_LOCKOUT_SECONDS = int(os.getenv("LOGIN_LOCKOUT_SECONDS", "900"))
+LOGIN_FAILED_CREDENTIAL_TTL = int(os.getenv("LOGIN_FAILED_CREDENTIAL_TTL", "300"))
+RATE_LIMIT_MAXSIZE = int(os.getenv("RATE_LIMIT_MAXSIZE", "10000"))
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+RATE_LIMIT_PREFIX = os.getenv("RATE_LIMIT_PREFIX", "ratelimit:")
+
+_CREDENTIAL_KEY = (os.getenv("SECRET_KEY") or "").encode()
+
+
+class MemoryWindowBackend:
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self._windows = TTLCache(maxsize=maxsize, ttl=max(LOGIN_IP_WINDOW, LOGIN_USER_WINDOW))
+        self._locks = TTLCache(maxsize=maxsize, ttl=LOGIN_LOCKOUT_SECONDS)
+        self._flags = TTLCache(maxsize=maxsize, ttl=LOGIN_FAILED_CREDENTIAL_TTL)
+        self._mutex = threading.Lock()
+
+    async def hit(self, key: str, window: int) -> int:
+        """Catat satu kejadian dan kembalikan jumlah kejadian dalam window."""
+        now = time.monotonic()
+        with self._mutex:
+            events = self._windows.get(key) or deque()
+            while events and events[0] <= now - window:
+                events.popleft()
+            events.append(now)
+            self._windows[key] = events  # set ulang agar TTL entri diperpanjang
+            return len(events)
+
+    async def clear(self, key: str) -> None:
+        with self._mutex:
+            self._windows.pop(key, None)
+
+    async def lock(self, key: str, seconds: int) -> None:
+        with self._mutex:
+            self._locks[key] = time.monotonic() + seconds
+
+    async def locked_for(self, key: str) -> float:
+        with self._mutex:
+            until = self._locks.get(key)
+        return max(0.0, until - time.monotonic()) if until else 0.0
+
+    async def flag(self, key: str) -> None:
+        with self._mutex:
+            self._flags[key] = True
+
+    async def is_flagged(self, key: str) -> bool:
+        with self._mutex:
+            return key in self._flags
+
+    async def unflag(self, key: str) -> None:
+        with self._mutex:
+            self._flags.pop(key, None)
+
+    def active_lockouts(self) -> Optional[int]:
+        now = time.monotonic()
+        with self._mutex:
+            return sum(1 for until in self._locks.values() if until > now)
+
+
+class RedisWindowBackend:
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str):
+        self._client = redis_asyncio.from_url(url)
+        self._prefix = prefix
+
+    async def hit(self, key: str, window: int) -> int:
+        now = time.time()
+        key = f"{self._prefix}win:{key}"
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, 0, now - window)
+            pipe.zadd(key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+            pipe.zcard(key)
+            pipe.expire(key, window)
+            _, _, count, _ = await pipe.execute()
+        return count
+
+    async def clear(self, key: str) -> None:
+        await self._client.delete(f"{self._prefix}win:{key}")
+
+    async def lock(self, key: str, seconds: int) -> None:
+        await self._client.set(f"{self._prefix}lock:{key}", 1, ex=seconds)
+
+    async def locked_for(self, key: str) -> float:
+        ttl = await self._client.ttl(f"{self._prefix}lock:{key}")
+        return float(ttl) if ttl and ttl > 0 else 0.0
+
+    async def flag(self, key: str) -> None:
+        await self._client.set(f"{self._prefix}bad:{key}", 1, ex=LOGIN_FAILED_CREDENTIAL_TTL)
+
+    async def is_flagged(self, key: str) -> bool:
+        return bool(await self._client.exists(f"{self._prefix}bad:{key}"))
+
+    async def unflag(self, key: str) -> None:
+        await self._client.delete(f"{self._prefix}bad:{key}")
+
+    def active_lockouts(self) -> Optional[int]:
+        return None
+
+
+def _too_many_attempts(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts. Please try again later.",
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+    )
+
+
+class LoginGuard:
+    def __init__(self, backend):
+        self.backend = backend
+        self._stats = {
+            "attempts": 0, "failures": 0, "successes": 0, "lockouts": 0,
+            "rejected_ip": 0, "rejected_locked": 0, "rejected_known_bad": 0, "backend_errors": 0,
+        }
+
+    @staticmethod
+    def _credential_key(username: str, password: str) -> str:
+        message = f"{username}\0{password}".encode()
+        return f"{username}:{hmac.new(_CREDENTIAL_KEY, message, hashlib.sha256).hexdigest()[:32]}"
+
+    async def check(self, username: str, client_ip: str) -> None:
+        """Tolak (429) jika IP melebihi batas atau username sedang dikunci."""
+        self._stats["attempts"] += 1
+        try:
+            ip_attempts = await self.backend.hit(f"ip:{client_ip}", LOGIN_IP_WINDOW)
+            locked_for = await self.backend.locked_for(f"user:{username}")
+        except RedisError:
+            # Backend bersama tidak tersedia: jangan blokir login
+            self._stats["backend_errors"] += 1
+            return
+
+        if ip_attempts > LOGIN_IP_LIMIT:
+            self._stats["rejected_ip"] += 1
+            raise _too_many_attempts(LOGIN_IP_WINDOW)
+        if locked_for > 0:
+            self._stats["rejected_locked"] += 1
+            raise _too_many_attempts(locked_for)
+
+    async def is_known_bad(self, username: str, password: str) -> bool:
+        """True jika kombinasi username + password ini baru saja gagal (tanpa DB/bcrypt)."""
+        try:
+            known_bad = await self.backend.is_flagged(self._credential_key(username, password))
+        except RedisError:
+            self._stats["backend_errors"] += 1
+            return False
+        if known_bad:
+            self._stats["rejected_known_bad"] += 1
+        return known_bad
+
+    async def record_failure(self, username: str, password: str) -> None:
+        self._stats["failures"] += 1
+        try:
+            await self.backend.flag(self._credential_key(username, password))
+            failures = await self.backend.hit(f"user:{username}", LOGIN_USER_WINDOW)
+            if failures >= LOGIN_USER_FAILURE_LIMIT:
+                await self.backend.lock(f"user:{username}", LOGIN_LOCKOUT_SECONDS)
+                await self.backend.clear(f"user:{username}")
+                self._stats["lockouts"] += 1
+        except RedisError:
+            self._stats["backend_errors"] += 1
+
+    async def record_success(self, username: str) -> None:
+        self._stats["successes"] += 1
+        try:
+            await self.backend.clear(f"user:{username}")
+        except RedisError:
+            self._stats["backend_errors"] += 1
+
+    async def forget_credentials(self, username: str, password: str) -> None:
+        """Hapus tanda gagal untuk kombinasi ini (mis. setelah username didaftarkan)."""
+        try:
+            await self.backend.unflag(self._credential_key(username, password))
+        except RedisError:
+            self._stats["backend_errors"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend.name,
+            "active_lockouts": self.backend.active_lockouts(),
+            **self._stats,
+            "ip_limit": LOGIN_IP_LIMIT,
+            "ip_window": LOGIN_IP_WINDOW,
+            "user_failure_limit": LOGIN_USER_FAILURE_LIMIT,
+            "user_window": LOGIN_USER_WINDOW,
+            "lockout_seconds": LOGIN_LOCKOUT_SECONDS,
+        }
+
+
+def _create_backend():
+    if RATE_LIMIT_URL and redis_asyncio is not None:
+        return RedisWindowBackend(RATE_LIMIT_URL, RATE_LIMIT_PREFIX)
+    return MemoryWindowBackend(RATE_LIMIT_MAXSIZE)
+
+
+login_guard = LoginGuard(_create_backend())
+
+
+def get_login_guard_stats() -> Dict:
+    return login_guard.stats()
@@ -0,0 +1,138 @@
+"""
+Perubahan skema untuk tabel yang sudah ada.
+
+Base.metadata.create_all hanya membuat tabel yang belum ada; indeks atau
+constraint yang ditambahkan ke model tabel lama tidak pernah dibuat di
+database yang sudah berjalan. Perubahan yang dibutuhkan agar query tetap
+benar didaftarkan di UPGRADES dan diterapkan saat startup (idempoten, di
+bawah GET_LOCK agar beberapa worker tidak menjalankan DDL bersamaan).
+
+Dengan SCHEMA_UPGRADE_ON_STARTUP=0 startup hanya memeriksa dan gagal jika ada
+yang belum diterapkan; jalankan manual lewat:
+
+    python -m core.schema_upgrade
+"""
+import logging
+import os
+from typing import Callable, List, NamedTuple, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import AddConstraint, CreateIndex
+from api.v1.models.events import Attendance, Event
+from api.v1.models.finance import Finance
+from api.v1.models.news import News
+from api.v1.models.notification import Notification
+from api.v1.models.user import Member
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_UPGRADE_ON_STARTUP = os.getenv("SCHEMA_UPGRADE_ON_STARTUP", "1") == "1"
+SCHEMA_UPGRADE_LOCK = "opn_schema_upgrade"
+SCHEMA_UPGRADE_LOCK_TIMEOUT = int(os.getenv("SCHEMA_UPGRADE_LOCK_TIMEOUT", "60"))   # detik
+
+
+class SchemaUpgrade(NamedTuple):
+    table: str
+    name: str                                           # nama indeks/constraint di database
+    ddl: Callable[[], object]                           # elemen DDL SQLAlchemy
+    prepare: Optional[Callable[[Connection], None]] = None
+
+
+def _constraint(model, name: str):
+    return next(constraint for constraint in model.__table__.constraints if constraint.name == name)
+
+
+def _index(model, name: str):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+def _dedupe_attendances(conn: Connection) -> None:
+    # Sisakan baris terbaru (id terbesar) per (event_id, member_id) sebelum UNIQUE ditambahkan
+    result = conn.execute(text(
+        "DELETE a FROM attendances a "
+        "JOIN attendances b ON a.event_id = b.event_id AND a.member_id = b.member_id AND a.id < b.id"
+    ))
+    if result.rowcount:
+        logger.warning("Menghapus %s baris kehadiran ganda sebelum menambah uq_attendance_event_member",
+                       result.rowcount)
+
+
+UPGRADES: List[SchemaUpgrade] = [
+    # Upsert kehadiran (INSERT ... ON DUPLICATE KEY UPDATE) butuh UNIQUE ini,
+    # tanpa itu setiap "update" menyisipkan baris baru
+    SchemaUpgrade("attendances", "uq_attendance_event_member",
+                  lambda: AddConstraint(_constraint(Attendance, "uq_attendance_event_member")),
+                  _dedupe_attendances),
+    # MATCH ... AGAINST (core/utils/search.py) error di MySQL tanpa FULLTEXT yang cocok
+    SchemaUpgrade("events", "ft_events_search", lambda: CreateIndex(_index(Event, "ft_events_search"))),
+    SchemaUpgrade("news", "ft_news_search", lambda: CreateIndex(_index(News, "ft_news_search"))),
+    SchemaUpgrade("members", "ft_members_full_name", lambda: CreateIndex(_index(Member, "ft_members_full_name"))),
+    # Keyset pagination (date DESC, id DESC) tanpa sort seluruh tabel
+    SchemaUpgrade("news", "ix_news_date_id", lambda: CreateIndex(_index(News, "ix_news_date_id"))),
+    SchemaUpgrade("finances", "ix_finances_date_id", lambda: CreateIndex(_index(Finance, "ix_finances_date_id"))),
+    # Inbox notifikasi (keyset per user) dan hitungan belum dibaca
+    SchemaUpgrade("notification", "ix_notification_user_created",
+                  lambda: CreateIndex(_index(Notification, "ix_notification_user_created"))),
+    SchemaUpgrade("notification", "ix_notification_user_read",
+                  lambda: CreateIndex(_index(Notification, "ix_notification_user_read"))),
+]
+
+
+def _existing_names(conn: Connection, table: str) -> Optional[set]:
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return None
+    names = {index["name"] for index in inspector.get_indexes(table)}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+    return names
+
+
+def pending_upgrades(conn: Connection) -> List[SchemaUpgrade]:
+    pending = []
+    for upgrade in UPGRADES:
+        existing = _existing_names(conn, upgrade.table)
+        # Tabel yang belum ada dibuat lengkap oleh create_all
+        if existing is not None and upgrade.name not in existing:
+            pending.append(upgrade)
+    return pending
+
+
+def ensure_schema(engine: Engine, apply: bool = SCHEMA_UPGRADE_ON_STARTUP) -> None:
+    """
+    Terapkan UPGRADES yang belum ada (apply=True) atau gagal dengan RuntimeError
+    jika masih ada yang belum diterapkan (apply=False).
+    """
+    with engine.connect() as conn:
+        if not apply:
+            missing = [f"{upgrade.table}.{upgrade.name}" for upgrade in pending_upgrades(conn)]
+            if missing:
+                raise RuntimeError(
+                    f"Skema database belum diperbarui ({', '.join(missing)}). "
+                    "Jalankan: python -m core.schema_upgrade"
+                )
+            return
+
+        locked = conn.scalar(text("SELECT GET_LOCK(:name, :timeout)"),
+                             {"name": SCHEMA_UPGRADE_LOCK, "timeout": SCHEMA_UPGRADE_LOCK_TIMEOUT})
+        if not locked:
+            raise RuntimeError("Tidak mendapat lock upgrade skema; worker lain mungkin masih menjalankannya")
+        try:
+            # Dicek ulang setelah lock: worker lain mungkin sudah menerapkannya
+            for upgrade in pending_upgrades(conn):
+                logger.info("Upgrade skema: %s.%s", upgrade.table, upgrade.name)
+                if upgrade.prepare:
+                    upgrade.prepare(conn)
+                    conn.commit()
+                conn.execute(upgrade.ddl())
+                conn.commit()
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": SCHEMA_UPGRADE_LOCK})
+            conn.commit()
+
+
+if __name__ == "__main__":
+    from core.database import engine
+    from core.logging_config import setup_logging
+
+    setup_logging()
+    ensure_schema(engine, apply=True)
@@ -5,9 +5,13 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from core.database import SessionLocal, get_db
 from api.v1.models.user import User
+from api.v1.models.auth import TokenVersion
 from dotenv import load_dotenv
 import os
-from sqlalchemy.orm import Session
+import threading
+from cachetools import TTLCache
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -16,15 +20,67 @@ ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
+# Varian tanpa auto_error untuk route yang juga menerima akses tanpa token (mis. signed URL)
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token", auto_error=False)
+
+# Cache principal (user yang terautentikasi) per subject token
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))            # detik
+PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", "1024"))
+
+_principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAXSIZE, ttl=PRINCIPAL_CACHE_TTL)
+_principal_cache_lock = threading.Lock()
+_principal_cache_stats = {"hits": 0, "misses": 0}
+
+# Access token baru membawa uid/role/ver sehingga request cukup diverifikasi
+# dari tanda tangannya; yang dicek ke DB hanya versi token per user, di-cache
+# sebentar. Dengan beberapa worker, pencabutan berlaku paling lambat setelah
+# TOKEN_VERSION_CACHE_TTL detik.
+TOKEN_VERSION_CACHE_TTL = int(os.getenv("TOKEN_VERSION_CACHE_TTL", "30"))    # detik
+
+_token_version_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAXSIZE, ttl=TOKEN_VERSION_CACHE_TTL)
+_token_version_stats = {"hits": 0, "misses": 0, "rejected": 0}
+# Penanda user sudah dihapus (tidak ada versi yang cocok)
+_USER_GONE = -1
 
 def create_access_token(data: dict):  # sourcery skip: simplify-dictionary-update
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=ACCESS_TOKEN_EXPIRE_MINUTES
     )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def access_token_claims(user: User, version: int) -> dict:
+    return {"sub": user.username, "uid": user.id, "role": user.role, "ver": version}
+
+def current_token_version(db: Session, user_id: int) -> int:
+    """Versi token user saat ini (di-cache); _USER_GONE jika user sudah dihapus."""
+    with _principal_cache_lock:
+        version = _token_version_cache.get(user_id)
+        _token_version_stats["hits" if version is not None else "misses"] += 1
+    if version is not None:
+        return version
+
+    row = db.execute(
+        select(func.coalesce(TokenVersion.version, 0))
+        .select_from(User)
+        .outerjoin(TokenVersion, TokenVersion.user_id == User.id)
+        .where(User.id == user_id)
+    ).first()
+    version = row[0] if row is not None else _USER_GONE
+
+    with _principal_cache_lock:
+        _token_version_cache[user_id] = version
+    return version
+
+def invalidate_token_version(user_id: int = None):
+    """Hapus versi token dari cache. Tanpa user_id, seluruh cache dikosongkan."""
+    with _principal_cache_lock:
+        if user_id is None:
+            _token_version_cache.clear()
+        else:
+            _token_version_cache.pop(user_id, None)
+
 # def verify_token(token: str = Depends(oauth2_scheme)):
 #     credentials_exception = HTTPException(
 #         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -46,7 +102,48 @@ def create_access_token(data: dict):  # sourcery skip: simplify-dictionary-updat
 #         raise credentials_exception
 #     return user
 
+def _snapshot_user(user: User) -> dict:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+def _restore_user(db: Session, snapshot: dict) -> User:
+    # Pasang kembali ke session tanpa query, relasi tetap bisa lazy-load
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def invalidate_principal(username: str = None):
+    """Hapus principal dari cache. Tanpa username, seluruh cache dikosongkan."""
+    with _principal_cache_lock:
+        if username is None:
+            _principal_cache.clear()
+        else:
+            _principal_cache.pop(username, None)
+
+def get_principal_cache_stats() -> dict:
+    with _principal_cache_lock:
+        hits = _principal_cache_stats["hits"]
+        misses = _principal_cache_stats["misses"]
+        size = len(_principal_cache)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+        "size": size,
+        "maxsize": PRINCIPAL_CACHE_MAXSIZE,
+        "ttl": PRINCIPAL_CACHE_TTL,
+        "token_versions": {
+            **_token_version_stats,
+            "size": len(_token_version_cache),
+            "ttl": TOKEN_VERSION_CACHE_TTL,
+        },
+    }
+
 def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return authenticate_token(token, db)
+
+def authenticate_token(token: str, db: Session) -> User:
+    """Validasi JWT dan kembalikan user-nya; 401 jika token tidak valid."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -60,9 +157,30 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
     except JWTError:
         raise credentials_exception
 
-    # Hapus baris ini: db = SessionLocal()
-    
+    if payload.get("type", "access") != "access":
+        raise credentials_exception
+
+    if "uid" in payload and "ver" in payload:
+        # ⚡ Token baru: principal dari klaim, hanya versi token yang dicek
+        if current_token_version(db, payload["uid"]) != payload["ver"]:
+            with _principal_cache_lock:
+                _token_version_stats["rejected"] += 1
+            raise credentials_exception
+        # Kolom lain (fcm_token, created_at, ...) di-lazy-load jika diakses
+        return _restore_user(db, {"id": payload["uid"], "username": username, "role": payload.get("role")})
+
+    # Token lama (hanya `sub`): lookup user lewat cache principal
+    with _principal_cache_lock:
+        snapshot = _principal_cache.get(username)
+        _principal_cache_stats["hits" if snapshot is not None else "misses"] += 1
+
+    if snapshot is not None:
+        return _restore_user(db, snapshot)
+
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+
+    with _principal_cache_lock:
+        _principal_cache[username] = _snapshot_user(user)
+    return user
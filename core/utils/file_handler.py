@@ -1,18 +1,158 @@
 import aiofiles
+import asyncio
+import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
 from typing import Optional
 from PIL import Image
-from io import BytesIO
+from core.utils.file_metadata import forget_metadata
+
+# Kompresi gambar berjalan di process pool agar tidak membekukan event loop
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+IMAGE_MAX_IN_FLIGHT = int(os.getenv("IMAGE_MAX_IN_FLIGHT", str(IMAGE_WORKERS * 2)))  # job yang sudah dikirim ke pool
+IMAGE_QUEUE_LIMIT = int(os.getenv("IMAGE_QUEUE_LIMIT", "64"))                        # job yang boleh menunggu slot
+IMAGE_QUEUE_TIMEOUT = float(os.getenv("IMAGE_QUEUE_TIMEOUT", "30"))                  # detik
+IMAGE_JPEG_QUALITY = 80
+IMAGE_WEBP_QUALITY = 75
+# Lebar varian responsif (px), mis. "160,480,1080"
+IMAGE_VARIANT_WIDTHS = [
+    int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "160,480,1080").split(",") if width.strip()
+]
+IMAGE_VARIANT_FORMATS = {"jpeg": ".jpg", "webp": ".webp"}
+# Penanda di nama file utama bahwa varian sudah dibuat (<nama>.rv.jpg), agar
+# serialisasi response tidak perlu mengecek disk
+VARIANT_MARKER = ".rv"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+_image_slots = asyncio.Semaphore(IMAGE_MAX_IN_FLIGHT)
+_image_queue_stats = {"waiting": 0, "in_flight": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+
+def _get_image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _image_pool
+
+
+def shutdown_image_pool():
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+
+def get_image_queue_stats() -> dict:
+    """Kedalaman antrean dan jumlah job kompresi gambar."""
+    return {
+        **_image_queue_stats,
+        "workers": IMAGE_WORKERS,
+        "max_in_flight": IMAGE_MAX_IN_FLIGHT,
+        "queue_limit": IMAGE_QUEUE_LIMIT,
+    }
+
+
+def variant_path(path: Path, width: int, fmt: str) -> Path:
+    """Lokasi varian: <nama>_<width>.jpg / <nama>_<width>.webp di samping file utama."""
+    return path.with_name(f"{path.stem}_{width}{IMAGE_VARIANT_FORMATS[fmt]}")
+
+
+def has_variants(photo_url: str) -> bool:
+    return Path(photo_url).stem.endswith(VARIANT_MARKER)
+
+
+def image_variant_urls(photo_url: Optional[str]) -> dict:
+    """
+    URL varian untuk sebuah foto, dalam bentuk {"160": {"jpeg": ..., "webp": ...}, ...}.
+    Kosong jika foto disimpan tanpa varian. Hanya olah string, tanpa I/O disk.
+    """
+    if not photo_url or not IMAGE_VARIANT_WIDTHS or not has_variants(photo_url):
+        return {}
+    main_path = Path(photo_url.lstrip("/"))
+    return {
+        str(width): {
+            fmt: f"/{variant_path(main_path, width, fmt).as_posix()}"
+            for fmt in IMAGE_VARIANT_FORMATS
+        }
+        for width in IMAGE_VARIANT_WIDTHS
+    }
+
+
+def _compress_image(source_path: str, dest_path: str, quality: int, variant_widths=()) -> None:
+    """
+    Dijalankan di process pool: konversi ke RGB dan simpan sebagai JPEG terkompresi,
+    lalu buat varian JPEG + WebP untuk setiap lebar di `variant_widths`.
+    """
+    with Image.open(source_path) as image:
+        rgb = image.convert("RGB")
+    rgb.save(dest_path, format="JPEG", quality=quality, optimize=True)
+
+    dest = Path(dest_path)
+    for width in variant_widths:
+        if rgb.width > width:
+            height = max(1, round(rgb.height * width / rgb.width))
+            variant = rgb.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            variant = rgb
+        variant.save(variant_path(dest, width, "webp"), format="WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        variant.save(variant_path(dest, width, "jpeg"), format="JPEG", quality=quality, optimize=True)
+
+
+async def run_image_job(func, *args):
+    """
+    Jalankan fungsi CPU-bound di process pool dengan backpressure:
+    maksimal IMAGE_MAX_IN_FLIGHT job berjalan, IMAGE_QUEUE_LIMIT job menunggu,
+    selebihnya (atau yang menunggu lebih dari IMAGE_QUEUE_TIMEOUT) ditolak 503.
+    """
+    if _image_queue_stats["waiting"] >= IMAGE_QUEUE_LIMIT:
+        _image_queue_stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Image processing queue is full, try again later")
+
+    _image_queue_stats["waiting"] += 1
+    try:
+        await asyncio.wait_for(_image_slots.acquire(), timeout=IMAGE_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _image_queue_stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Image processing queue is full, try again later")
+    finally:
+        _image_queue_stats["waiting"] -= 1
+
+    _image_queue_stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_get_image_pool(), func, *args)
+        _image_queue_stats["completed"] += 1
+        return result
+    except Exception:
+        _image_queue_stats["failed"] += 1
+        raise
+    finally:
+        _image_queue_stats["in_flight"] -= 1
+        _image_slots.release()
+
 
 class FileHandler:
     def __init__(self, base_path: str = "uploads"):
         self.base_path = base_path
+
+    @staticmethod
+    async def _write_upload(file: UploadFile, path: Path):
+        """Tulis upload ke disk per chunk, tanpa memuat seluruh isi file ke memori."""
+        async with aiofiles.open(path, 'wb') as out_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await out_file.write(chunk)
         
-    async def save_file(self, file: UploadFile, category: str, filename: str) -> str:
-        """Menyimpan file ke dalam direktori tertentu dengan nama yang diberikan."""
+    async def save_file(self, file: UploadFile, category: str, filename: str, variants: bool = False) -> str:
+        """
+        Menyimpan file ke dalam direktori tertentu dengan nama yang diberikan.
+        Jika `variants` True, gambar juga disimpan dalam ukuran IMAGE_VARIANT_WIDTHS (JPEG + WebP).
+        """
         today = datetime.now()
         year_month = today.strftime("%Y-%m")
         category_path = Path(self.base_path) / category / year_month
@@ -21,27 +161,36 @@ class FileHandler:
         # Paksa simpan sebagai JPEG untuk kompresi
         file_path = category_path / Path(filename).with_suffix(".jpg")
 
-        content = await file.read()
-
         # Jika file adalah gambar dan termasuk dalam kategori yang ditarget
         if file.content_type.startswith("image/"):
+            plain_path = file_path
+            if variants and IMAGE_VARIANT_WIDTHS:
+                file_path = category_path / f"{Path(filename).stem}{VARIANT_MARKER}.jpg"
+            upload_path = file_path.with_suffix(".upload")
+            await self._write_upload(file, upload_path)
             try:
-                image = Image.open(BytesIO(content)).convert("RGB")
-
-                # Simpan terkompresi sebagai JPEG
-                with open(file_path, "wb") as f:
-                    image.save(f, format="JPEG", quality=80, optimize=True)
-                print(f"[INFO] Gambar dikompres dan disimpan ke {file_path}")
-            except Exception as e:
-                print(f"[ERROR] Gagal mengompres gambar: {e}")
-                # Fallback
-                async with aiofiles.open(file_path, 'wb') as out_file:
-                    await out_file.write(content)
+                # Simpan terkompresi sebagai JPEG (di process pool)
+                await run_image_job(
+                    _compress_image,
+                    str(upload_path),
+                    str(file_path),
+                    IMAGE_JPEG_QUALITY,
+                    tuple(IMAGE_VARIANT_WIDTHS) if variants else (),
+                )
+                os.remove(upload_path)
+                logger.debug("Gambar dikompres dan disimpan ke %s", file_path)
+            except HTTPException:
+                os.remove(upload_path)
+                raise
+            except Exception:
+                logger.warning("Gagal mengompres gambar %s, file asli disimpan", file_path, exc_info=True)
+                # Fallback: simpan file asli (tanpa penanda varian)
+                file_path = plain_path
+                os.replace(upload_path, file_path)
         else:
             # Simpan file secara biasa jika bukan target kategori/gambar
-            print(f"[ERROR] Bukan gambar euy: {file.content_type}")
-            async with aiofiles.open(file_path, 'wb') as out_file:
-                await out_file.write(content)
+            logger.debug("Bukan gambar, disimpan apa adanya: %s", file.content_type)
+            await self._write_upload(file, file_path)
 
         return f"/{file_path.as_posix()}"
 
@@ -92,9 +241,16 @@ class FileHandler:
             file_url = file_url[1:]  # Hilangkan '/' di awal agar cocok dengan path lokal
         
         file_path = Path(file_url)
+        paths = [file_path] + [
+            variant_path(file_path, width, fmt)
+            for width in IMAGE_VARIANT_WIDTHS
+            for fmt in IMAGE_VARIANT_FORMATS
+        ]
 
-        try:
-            if file_path.exists():
-                os.remove(file_path)
-        except Exception as e:
-            print(f"Warning: gagal menghapus file {file_path} - {e}")
+        for path in paths:
+            forget_metadata(path)
+            try:
+                if path.exists():
+                    os.remove(path)
+            except Exception as e:
+                logger.warning("Gagal menghapus file %s: %s", path, e)
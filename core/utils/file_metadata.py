@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Mapping, Optional
+from cachetools import LRUCache
+
+# Metadata file (ETag berbasis hash isi, ukuran, mtime) disimpan di sidecar
+# <file>.meta.json dan di-cache di memori agar request kondisional bisa
+# dijawab 304 tanpa menyentuh disk.
+SIDECAR_SUFFIX = ".meta.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+FILE_METADATA_CACHE_SIZE = int(os.getenv("FILE_METADATA_CACHE_SIZE", "4096"))
+
+_metadata_cache = LRUCache(maxsize=FILE_METADATA_CACHE_SIZE)
+_metadata_lock = threading.Lock()
+
+
+def sidecar_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+def get_cached_metadata(path) -> Optional[dict]:
+    """Metadata dari cache memori saja (tanpa I/O disk)."""
+    with _metadata_lock:
+        return _metadata_cache.get(str(path))
+
+
+def _remember(path, metadata: dict) -> dict:
+    with _metadata_lock:
+        _metadata_cache[str(path)] = metadata
+    return metadata
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_metadata(path) -> Optional[dict]:
+    """
+    Metadata file dari sidecar (atau dihitung ulang jika sidecar tidak ada/usang).
+    Mengembalikan None jika file tidak ada. Blocking, jalankan di threadpool.
+    """
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    if not path.is_file():
+        return None
+
+    sidecar = sidecar_path(path)
+    try:
+        with open(sidecar) as f:
+            metadata = json.load(f)
+        if metadata.get("size") == stat.st_size and metadata.get("mtime") == int(stat.st_mtime):
+            return _remember(path, metadata)
+    except (OSError, ValueError):
+        pass
+
+    metadata = {
+        "etag": f'"{_hash_file(path)[:32]}"',
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+    }
+    try:
+        with open(sidecar, "w") as f:
+            json.dump(metadata, f)
+    except OSError:
+        pass  # sidecar hanya optimasi, tetap sajikan file
+    return _remember(path, metadata)
+
+
+def forget_metadata(path) -> None:
+    """Hapus metadata dari cache dan sidecar-nya (dipanggil saat file dihapus)."""
+    with _metadata_lock:
+        _metadata_cache.pop(str(path), None)
+    try:
+        os.remove(sidecar_path(path))
+    except OSError:
+        pass
+
+
+def last_modified(metadata: dict) -> str:
+    return formatdate(metadata["mtime"], usegmt=True)
+
+
+def is_not_modified(metadata: dict, headers: Mapping[str, str]) -> bool:
+    """Evaluasi If-None-Match / If-Modified-Since (If-None-Match diutamakan, RFC 9110)."""
+    if if_none_match := headers.get("if-none-match"):
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or metadata["etag"] in tags
+
+    if if_modified_since := headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return metadata["mtime"] <= int(since.timestamp())
+
+    return False
@@ -0,0 +1,47 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+T = TypeVar("T")
+
+Position = Tuple[datetime, int]
+
+
+def encode_cursor(date: datetime, row_id: int) -> str:
+    """Cursor opaque (base64 url-safe) untuk posisi (date, id)."""
+    raw = json.dumps([date.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Position:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date_value), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_before(date_column, id_column, position: Position):
+    """Kondisi WHERE untuk baris sesudah cursor pada urutan (date DESC, id DESC)."""
+    date, row_id = position
+    return or_(date_column < date, and_(date_column == date, id_column < row_id))
+
+
+def split_page(
+    rows: Sequence[T],
+    limit: int,
+    position_of: Callable[[T], Position]
+) -> Tuple[List[T], Optional[str]]:
+    """
+    Potong hasil query yang diambil dengan LIMIT limit + 1.
+    Mengembalikan baris halaman ini dan cursor halaman berikutnya (None jika habis).
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(*position_of(page[-1]))
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from typing import List, Optional
+from sqlalchemy import event
+from core.database import engine, async_engine
+
+# Batas jumlah statement untuk endpoint listing: query utama, satu query
+# selectinload per relasi, dan COUNT(*) untuk pagination.
+LISTING_QUERY_BUDGET = 4
+
+
+class QueryCounter:
+    """Mencatat statement SQL yang dieksekusi selama blok `count_queries` aktif."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(*binds):
+    """
+    Hitung statement yang dijalankan pada engine sync dan async (default keduanya).
+
+        with count_queries() as queries:
+            client.get("/api/v1/events/")
+        print(queries.count)
+    """
+    targets = [getattr(bind, "sync_engine", bind) for bind in (binds or (engine, async_engine))]
+    counter = QueryCounter()
+    for target in targets:
+        event.listen(target, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(limit: Optional[int] = None, *binds):
+    """
+    Gagal (AssertionError) jika blok mengeksekusi lebih dari `limit` statement,
+    mis. karena lazy-load per baris (N+1). Dipakai di test:
+
+        with assert_max_queries(LISTING_QUERY_BUDGET):
+            client.get("/api/v1/events/?limit=10")
+    """
+    limit = LISTING_QUERY_BUDGET if limit is None else limit
+    with count_queries(*binds) as counter:
+        yield counter
+    if counter.count > limit:
+        executed = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(
+            f"Expected at most {limit} SQL statements, got {counter.count}:\n{executed}"
+        )
@@ -0,0 +1,36 @@
+import os
+import re
+from typing import Optional
+from sqlalchemy.dialects.mysql import match
+
+# Token yang lebih pendek dari innodb_ft_min_token_size tidak masuk indeks FULLTEXT
+FULLTEXT_MIN_TOKEN_SIZE = int(os.getenv("FULLTEXT_MIN_TOKEN_SIZE", "3"))
+# \w tidak mencakup operator boolean MySQL (+ - < > ( ) ~ * " @), jadi aman dari injeksi operator
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def boolean_query(keyword: str) -> Optional[str]:
+    """
+    Ubah kata kunci bebas menjadi query BOOLEAN MODE: setiap kata wajib (+)
+    dan dicocokkan sebagai prefix (*). None jika tidak ada kata yang terindeks.
+    """
+    terms = [
+        term for term in _TOKEN_PATTERN.findall(keyword.lower())
+        if len(term) >= FULLTEXT_MIN_TOKEN_SIZE
+    ]
+    if not terms:
+        return None
+    return " ".join(f"+{term}*" for term in terms)
+
+
+def fulltext_match(columns, keyword: str):
+    """
+    Ekspresi MATCH (...) AGAINST (... IN BOOLEAN MODE) untuk kolom yang punya
+    indeks FULLTEXT (urutan kolom harus sama dengan indeksnya). Nilainya adalah
+    skor relevansi, bisa dipakai di WHERE dan ORDER BY. None jika kata kunci
+    terlalu pendek untuk indeks; pemanggil perlu fallback ke LIKE 'kw%'.
+    """
+    query = boolean_query(keyword)
+    if query is None:
+        return None
+    return match(*columns, against=query).in_boolean_mode()
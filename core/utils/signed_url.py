@@ -0,0 +1,52 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# URL media ditandatangani HMAC dan berlaku terbatas, sehingga route file bisa
+# memverifikasinya tanpa query database.
+MEDIA_URL_SECRET = (os.getenv("MEDIA_URL_SECRET") or os.getenv("SECRET_KEY") or "").encode()
+MEDIA_URL_TTL = int(os.getenv("MEDIA_URL_TTL", "3600"))        # detik minimal URL berlaku
+# Waktu kedaluwarsa dibulatkan ke kelipatan bucket agar URL yang sama
+# dipakai ulang dalam satu jendela (tetap bisa di-cache klien/ETag).
+MEDIA_URL_BUCKET = int(os.getenv("MEDIA_URL_BUCKET", "900"))
+# File privat (foto user) tidak pernah ditandatangani: URL bertanda tangan ikut
+# terkirim di response bersama (mis. pencarian member) dan akan melewati cek
+# pemilik/admin. Route file tetap mewajibkan Bearer token untuk path ini.
+PRIVATE_PREFIXES = ("users/",)
+
+
+def _canonical_path(url: str) -> str:
+    return url.split("?", 1)[0].lstrip("/")
+
+
+def is_private_path(url: str) -> bool:
+    path = _canonical_path(url).removeprefix("uploads/")
+    return path.startswith(PRIVATE_PREFIXES)
+
+
+def _signature(path: str, expires: int) -> str:
+    message = f"{path}:{expires}".encode()
+    digest = hmac.new(MEDIA_URL_SECRET, message, hashlib.sha256).digest()[:20]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def sign_url(url: Optional[str]) -> Optional[str]:
+    """Tambahkan ?exp=...&sig=... pada URL file lokal (/uploads/...), kecuali file privat."""
+    if not url or url.startswith(("http://", "https://")) or is_private_path(url):
+        return url
+    path = _canonical_path(url)
+    expires = ((int(time.time()) + MEDIA_URL_TTL) // MEDIA_URL_BUCKET + 1) * MEDIA_URL_BUCKET
+    return f"/{path}?exp={expires}&sig={_signature(path, expires)}"
+
+
+def verify_signed_path(path: str, expires: Optional[int], signature: Optional[str]) -> bool:
+    """Validasi tanda tangan dan masa berlaku URL (stateless, tanpa database)."""
+    if not expires or not signature or expires < time.time() or is_private_path(path):
+        return False
+    return hmac.compare_digest(_signature(_canonical_path(path), expires), signature)
@@ -4,19 +4,26 @@ from fastapi.responses import JSONResponse
 from api.v1.endpoints import (
     auth, events, finance, member,
     news, minutes, feedback,
-    uploads, notification, file
+    uploads, notification, file, system
 )
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from starlette.status import HTTP_401_UNAUTHORIZED
 
-from core.database import SessionLocal
+from core.logging_config import RequestIdMiddleware, setup_logging
+from core.database import Base, SessionLocal, async_engine, engine
+from core.metrics import MetricsMiddleware, instrument_engine
+from core.schema_upgrade import ensure_schema
 from core.security import verify_token
+from core.utils.file_handler import shutdown_image_pool
+from api.v1.endpoints.finance_service import ensure_monthly_summary
+from api.v1.endpoints.outbox_worker import start_outbox_worker, stop_outbox_worker
 import os
 from pydantic import BaseModel, ConfigDict
 
 import hmac
 import hashlib
+import logging
 import os
 import subprocess
 from typing import Dict, Any
@@ -27,6 +34,10 @@ from fastapi import (
 )
 
 
+# Log JSON non-blocking (antrean + thread listener), lihat core/logging_config.py
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # GITHUB_WEBHOOK_SECRET harus diatur di file .env Anda
 WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET") 
 if not WEBHOOK_SECRET:
@@ -60,7 +71,8 @@ app = FastAPI(
         {"name": "Uploads - Events", "description": "Upload files related to events"},
         {"name": "Uploads - Finance", "description": "Upload finance documents"},
         {"name": "Uploads - User", "description": "Upload user profile photos"},
-        {"name": "notifications", "description": "Notification management"}
+        {"name": "notifications", "description": "Notification management"},
+        {"name": "system", "description": "Runtime diagnostics"}
     ]
 )
 
@@ -89,11 +101,39 @@ app.include_router(feedback.router, prefix="/api/v1/feedback", tags=["feedback"]
 app.include_router(minutes.router, prefix="/api/v1/meeting-minutes", tags=["meeting-minutes"])
 app.include_router(uploads.router, prefix="/api/v1/uploads")
 app.include_router(notification.router, prefix="/api/v1/notifications", tags=["notifications"])
+app.include_router(system.router, prefix="/api/v1/system", tags=["system"])
+app.include_router(system.metrics_router, tags=["system"])
 # Di main.py, sebelum app.mount
 
 # Ganti app.mount dengan ini:
 app.include_router(file.router, tags=["file"])
 
+@app.on_event("startup")
+def prepare_database():
+    # Hanya membuat tabel yang belum ada (mis. finance_monthly_summary); tabel lama tidak diubah
+    Base.metadata.create_all(bind=engine)
+    # Indeks/constraint baru pada tabel lama (lihat core/schema_upgrade.py)
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        ensure_monthly_summary(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_push_worker():
+    # Kirim push dari notification_outbox (nonaktifkan dengan OUTBOX_WORKER_IN_APP=0
+    # jika worker dijalankan sebagai proses terpisah)
+    start_outbox_worker()
+
+@app.on_event("shutdown")
+async def stop_push_worker():
+    await stop_outbox_worker()
+
+@app.on_event("shutdown")
+def stop_image_pool():
+    shutdown_image_pool()
+
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next):
     path = request.url.path.lstrip('/')
@@ -102,6 +142,15 @@ async def auth_middleware(request: Request, call_next):
         return await call_next(request)
 
     return await call_next(request)
+
+# ⏱️ Latensi, jumlah query & byte per route (lihat core/metrics.py). Ditambahkan
+# terakhir agar menjadi middleware paling luar dan mengukur seluruh request.
+instrument_engine(engine)
+instrument_engine(async_engine)
+app.add_middleware(MetricsMiddleware)
+# Paling luar: request_id sudah tersedia untuk log middleware lain (termasuk slow request)
+app.add_middleware(RequestIdMiddleware)
+
 # @app.middleware("http")
 # async def auth_middleware(request: Request, call_next):
 #     # Biarkan request ke endpoint API langsung pass
@@ -164,17 +213,21 @@ def run_deployment():
     # Pastikan Anda menggunakan pnpm run build:simple (atau npm install -g pnpm && pnpm install)
     # Ini sangat penting agar instalasi dependencies di server Anda sukses
     
-    print(f"Deployment: Memulai script {SCRIPT_PATH}")
+    logger.info("Deployment: Memulai script %s", SCRIPT_PATH)
     
     # Jalankan deploy.sh
-    subprocess.run(
+    result = subprocess.run(
         ["/bin/bash", SCRIPT_PATH], 
         check=False,
         capture_output=True, 
         text=True,
         cwd=DEPLOY_DIR,
     )
-    # ... (log output sukses/gagal di sini) ...
+    if result.returncode == 0:
+        logger.info("Deployment selesai", extra={"stdout": result.stdout[-2000:]})
+    else:
+        logger.error("Deployment gagal (exit %s)", result.returncode,
+                     extra={"stdout": result.stdout[-2000:], "stderr": result.stderr[-2000:]})
 
 
 # --- ENDPOINT UTAMA (/webhook) ---